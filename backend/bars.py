@@ -0,0 +1,109 @@
+import numpy as np
+
+# Timeframes built from live ticks, in seconds
+TIMEFRAMES = {"1s": 1, "1m": 60, "5m": 300, "1h": 3600}
+# Bars kept in memory per ticker and timeframe
+RING_CAPACITY = 1000
+
+# Ring rows use the candle store layout:
+# [timestamp_ms, open, high, low, close, volume]
+COLUMNS = 6
+
+
+class BarRing:
+    """
+    Fixed-size ring buffer of bars backed by one numpy array.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.rows = np.zeros((capacity, COLUMNS))
+        self.capacity = capacity
+        self.count = 0
+        self.head = 0  # index of the next slot to write
+
+    def append(self, row):
+        self.rows[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last(self):
+        return self.rows[(self.head - 1) % self.capacity] if self.count else None
+
+    def recent(self, n=None):
+        """
+        Oldest-first copy of the last n bars.
+        """
+        n = self.count if n is None else min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.rows[idx]
+
+
+class BarBuilder:
+    """
+    Rolls one ticker's tick stream into OHLCV bars for every timeframe.
+
+    Ticks only carry the rolling 24h volume, so bar volume is the increase
+    of that figure between ticks (0 when it drops or is missing). Callers
+    pass the base asset volume, the unit exchange candles and the candle
+    store use, so live bars can be joined onto stored history. Stock ticks
+    carry no volume at all and their bars always have a volume of 0. A bar
+    is reported closed when the first tick of the next bar arrives.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, capacity=RING_CAPACITY):
+        self.timeframes = dict(timeframes)
+        self.rings = {tf: BarRing(capacity) for tf in self.timeframes}
+        self.last_volume = None
+
+    def on_tick(self, price, timestamp_ms, volume=None):
+        """
+        Applies a tick and returns (timeframe, bar_row, closed) events:
+        the bar that just closed, if any, then the bar the tick updated.
+        """
+        if price is None or timestamp_ms is None:
+            return []
+
+        traded = 0.0
+        if volume is not None:
+            if self.last_volume is not None and volume > self.last_volume:
+                traded = volume - self.last_volume
+            self.last_volume = volume
+
+        events = []
+        for tf, seconds in self.timeframes.items():
+            ring = self.rings[tf]
+            width = seconds * 1000
+            start = timestamp_ms - timestamp_ms % width
+            bar = ring.last()
+
+            if bar is not None and bar[0] == start:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += traded
+            elif bar is None or start > bar[0]:
+                if bar is not None:
+                    events.append((tf, bar.copy(), True))
+                ring.append((start, price, price, price, price, traded))
+                bar = ring.last()
+            else:
+                # Out-of-order tick for a bar that already closed
+                continue
+
+            events.append((tf, bar.copy(), False))
+        return events
+
+    def recent(self, timeframe, n=None):
+        return self.rings[timeframe].recent(n)
+
+
+def bar_to_dict(row):
+    return {
+        "time": float(row[0]) / 1000,
+        "open": float(row[1]),
+        "high": float(row[2]),
+        "low": float(row[3]),
+        "close": float(row[4]),
+        "volume": float(row[5]),
+    }
+
@@ -0,0 +1,364 @@
+"""
+Offline load test for the backend.
+
+Starts the API with the simulated market data provider, then drives many
+concurrent WebSocket clients plus /history and /search traffic against it
+and reports latency percentiles, throughput and the server's CPU and
+memory use. Nothing talks to Binance or Yahoo, so it runs in CI.
+
+    python benchmark.py --clients 2000 --duration 30
+    python benchmark.py --mode legacy --clients 500 --json results.json
+    python benchmark.py --protocol binary
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import websockets
+from tick_codec import PROTOCOL as BINARY_PROTOCOL, TickDecoder
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TICKERS = [
+    "BTC/USDT", "ETH/USDT", "SOL/USDT", "XRP/USDT", "DOGE/USDT", "ADA/USDT",
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "TSLA", "META", "JPM",
+]
+HISTORY_RANGES = [("1d", "1m"), ("1d", "5m"), ("5d", "1d"), ("1mo", "1d"), ("1y", "1d")]
+SEARCH_QUERIES = ["b", "bt", "btc", "eth", "app", "micro", "bank", "so", "tes", "nv", "a", "coin"]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50),
+        "p99_ms": percentile(values, 99),
+        "max_ms": max(values) if values else None,
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.connect_ms = []
+        self.tick_latency_ms = []
+        self.messages = 0
+        self.updates = 0
+        self.bytes_in = 0
+        self.ws_errors = 0
+        self.http_ms = {"history": [], "search": []}
+        self.http_errors = 0
+
+
+class ResourceSampler:
+    """
+    CPU time and peak RSS of the server process, read from /proc so no
+    extra dependency is needed (Linux only; other platforms report None).
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_rss = 0
+        self.cpu_start = self.wall_start = None
+        self.cpu_end = self.wall_end = None
+
+    def _cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except OSError:
+            return None
+
+    def _rss_bytes(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    async def run(self, stop):
+        self.cpu_start, self.wall_start = self._cpu_seconds(), time.monotonic()
+        while not stop.is_set():
+            self.peak_rss = max(self.peak_rss, self._rss_bytes())
+            await asyncio.sleep(0.5)
+        self.cpu_end, self.wall_end = self._cpu_seconds(), time.monotonic()
+
+    def report(self):
+        cpu = None
+        if self.cpu_start is not None and self.cpu_end is not None:
+            cpu = round(100 * (self.cpu_end - self.cpu_start) / (self.wall_end - self.wall_start), 1)
+        return {"cpu_percent": cpu, "peak_rss_mb": round(self.peak_rss / 2**20, 1) or None}
+
+
+async def http_get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return int(data.split(b" ", 2)[1])
+
+
+async def ws_client(i, args, stats, connected, stop):
+    ticker = TICKERS[i % len(TICKERS)]
+    if args.mode == "legacy":
+        url = f"ws://127.0.0.1:{args.port}/ws/{ticker}"
+    else:
+        url = f"ws://127.0.0.1:{args.port}/ws"
+
+    binary = args.protocol == "binary"
+    subprotocols = [BINARY_PROTOCOL] if binary else None
+    decoder = TickDecoder()
+
+    start = time.monotonic()
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=60, ping_interval=None,
+                                      subprotocols=subprotocols) as ws:
+            if args.mode != "legacy":
+                tickers = [TICKERS[(i + k) % len(TICKERS)] for k in range(args.tickers_per_client)]
+                await ws.send(json.dumps({"action": "subscribe", "tickers": tickers}))
+            stats.connect_ms.append((time.monotonic() - start) * 1000)
+            connected.release()
+
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                now_ms = time.time() * 1000
+                stats.messages += 1
+                stats.bytes_in += len(raw)
+
+                if isinstance(raw, bytes):
+                    updates = decoder.decode(raw)
+                else:
+                    message = json.loads(raw)
+                    updates = message.get("updates", []) if message.get("type") == "batch" else [message]
+                for update in updates:
+                    if "timestamp" in update:
+                        stats.updates += 1
+                        stats.tick_latency_ms.append(now_ms - update["timestamp"])
+    except Exception as e:
+        stats.ws_errors += 1
+        if stats.ws_errors <= 5:
+            print(f"WebSocket client {i} failed: {e!r}")
+        connected.release()
+
+
+async def http_worker(kind, rate, args, stats, stop):
+    if rate <= 0:
+        return
+    rng = random.Random(kind)
+    interval = 1 / rate
+    pending = set()
+    next_at = time.monotonic()
+
+    async def one(path):
+        start = time.monotonic()
+        try:
+            status = await http_get(args.port, path)
+            if status != 200:
+                stats.http_errors += 1
+            stats.http_ms[kind].append((time.monotonic() - start) * 1000)
+        except Exception:
+            stats.http_errors += 1
+
+    while not stop.is_set():
+        if kind == "history":
+            period, interval_ = rng.choice(HISTORY_RANGES)
+            ticker = rng.choice(TICKERS).replace("/", "%2F")
+            path = f"/history/{ticker}?period={period}&interval={interval_}&max_points=1000"
+        else:
+            path = f"/search?q={rng.choice(SEARCH_QUERIES)}"
+        task = asyncio.create_task(one(path))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+        next_at += interval
+        await asyncio.sleep(max(0, next_at - time.monotonic()))
+
+    if pending:
+        await asyncio.wait(pending, timeout=10)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def start_server(args, data_dir):
+    env = dict(
+        os.environ,
+        BAKU_PROVIDER="simulated",
+        BAKU_DATA_DIR=data_dir,
+        BAKU_TICK_INTERVAL=str(args.tick_interval),
+        BAKU_SIM_LATENCY=str(args.upstream_latency),
+    )
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning",
+        "--backlog", "4096",
+    ]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, preexec_fn=raise_fd_limit)
+
+
+async def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if await http_get(port, "/") == 200:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run(args):
+    stats = Stats()
+    stop = asyncio.Event()
+    await wait_ready(args.port)
+
+    sampler = ResourceSampler(args.server_pid)
+    sampler_task = asyncio.create_task(sampler.run(stop))
+
+    # Ramp clients up with a bounded number of handshakes in flight
+    connected = asyncio.Semaphore(0)
+    clients = []
+    ramp_start = time.monotonic()
+    in_flight = asyncio.Semaphore(args.connect_concurrency)
+
+    async def start_client(i):
+        async with in_flight:
+            clients.append(asyncio.create_task(ws_client(i, args, stats, connected, stop)))
+            await connected.acquire()
+
+    await asyncio.gather(*(start_client(i) for i in range(args.clients)))
+    ramp_s = time.monotonic() - ramp_start
+
+    # Measure steady state only
+    stats.tick_latency_ms.clear()
+    stats.messages = stats.updates = stats.bytes_in = 0
+    measure_start = time.monotonic()
+    workers = [
+        asyncio.create_task(http_worker("history", args.history_rps, args, stats, stop)),
+        asyncio.create_task(http_worker("search", args.search_rps, args, stats, stop)),
+    ]
+    await asyncio.sleep(args.duration)
+    elapsed = time.monotonic() - measure_start
+    messages, updates, bytes_in = stats.messages, stats.updates, stats.bytes_in
+
+    stop.set()
+    await asyncio.gather(*workers, *clients, sampler_task, return_exceptions=True)
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "protocol": args.protocol,
+            "clients": args.clients,
+            "tickers_per_client": args.tickers_per_client if args.mode != "legacy" else 1,
+            "duration_s": args.duration,
+            "tick_interval_s": args.tick_interval,
+            "history_rps": args.history_rps,
+            "search_rps": args.search_rps,
+        },
+        "websocket": {
+            "ramp_s": round(ramp_s, 2),
+            "connect": summarize(stats.connect_ms),
+            "tick_latency": summarize(stats.tick_latency_ms),
+            "messages_per_s": round(messages / elapsed, 1),
+            "updates_per_s": round(updates / elapsed, 1),
+            "bytes_in_per_s": round(bytes_in / elapsed, 1),
+            "errors": stats.ws_errors,
+        },
+        "http": {
+            "history": summarize(stats.http_ms["history"]),
+            "search": summarize(stats.http_ms["search"]),
+            "errors": stats.http_errors,
+        },
+        "server": sampler.report(),
+    }
+
+
+def print_report(report):
+    def fmt(summary):
+        if not summary["count"]:
+            return "n=0"
+        return f"n={summary['count']} p50={summary['p50_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms max={summary['max_ms']:.1f}ms"
+
+    ws, http, server = report["websocket"], report["http"], report["server"]
+    print(f"config      {report['config']}")
+    print(f"ws connect  {fmt(ws['connect'])} (ramp {ws['ramp_s']}s, errors {ws['errors']})")
+    print(f"tick lat.   {fmt(ws['tick_latency'])}")
+    print(f"throughput  {ws['messages_per_s']} msg/s, {ws['updates_per_s']} updates/s, {ws['bytes_in_per_s'] / 1024:.1f} KiB/s")
+    print(f"/history    {fmt(http['history'])}")
+    print(f"/search     {fmt(http['search'])} (http errors {http['errors']})")
+    print(f"server      cpu {server['cpu_percent']}%  peak rss {server['peak_rss_mb']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--tickers-per-client", type=int, default=3)
+    parser.add_argument("--mode", choices=["multiplex", "legacy"], default="multiplex",
+                        help="multiplex uses /ws, legacy one /ws/{ticker} socket per client")
+    parser.add_argument("--protocol", choices=["json", "binary"], default="json",
+                        help=f"binary negotiates the {BINARY_PROTOCOL} tick subprotocol")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds after ramp-up")
+    parser.add_argument("--history-rps", type=float, default=20)
+    parser.add_argument("--search-rps", type=float, default=50)
+    parser.add_argument("--tick-interval", type=float, default=1.0, help="server upstream poll interval")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="simulated upstream latency")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="exit non-zero when WebSocket + HTTP errors exceed this")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    args.port = args.port or free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = start_server(args, data_dir)
+        args.server_pid = server.pid
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    errors = report["websocket"]["errors"] + report["http"]["errors"]
+    if args.max_errors is not None and errors > args.max_errors:
+        sys.exit(f"{errors} errors (max {args.max_errors})")
+
+
+if __name__ == "__main__":
+    main()
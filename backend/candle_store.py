@@ -0,0 +1,177 @@
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+# One row per candle: [timestamp_ms, open, high, low, close, volume]
+COLUMNS = 6
+EMPTY = np.empty((0, COLUMNS), dtype=np.float64)
+
+DEFAULT_ROOT = os.getenv(
+    "BAKU_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "candles")
+)
+
+
+def _safe_name(ticker):
+    name = ticker.replace("/", "_").replace("\\", "_")
+    if not name or ".." in name or name.startswith("."):
+        raise ValueError(f"Invalid ticker for the candle store: {ticker!r}")
+    return name
+
+
+def _safe_timeframe(timeframe):
+    if not timeframe or ".." in timeframe or "/" in timeframe or "\\" in timeframe:
+        raise ValueError(f"Invalid timeframe for the candle store: {timeframe!r}")
+    return timeframe
+
+
+class CandleStore:
+    """
+    On-disk OHLCV store, one flat float64 file per (ticker, timeframe).
+
+    Files are read through np.memmap so only the requested window is paged
+    in. New candles are appended in place; the last stored candle is
+    overwritten when it comes back from upstream because it was probably
+    still forming when we saved it.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def _path(self, ticker, timeframe):
+        return os.path.join(self.root, _safe_name(ticker), f"{_safe_timeframe(timeframe)}.f64")
+
+    def _meta_path(self, ticker, timeframe):
+        return os.path.join(self.root, _safe_name(ticker), f"{_safe_timeframe(timeframe)}.json")
+
+    @contextmanager
+    def _locked(self, ticker, timeframe):
+        """
+        Exclusive lock on one series across processes, so workers sharing
+        the store do not interleave appends or rewrites.
+        """
+        path = self._path(ticker, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, ticker, timeframe):
+        path = self._path(ticker, timeframe)
+        try:
+            if os.path.getsize(path) < COLUMNS * 8:
+                return EMPTY
+        except OSError:
+            return EMPTY
+        data = np.memmap(path, dtype="<f8", mode="r")
+        # Ignore a trailing partial row left by an interrupted append
+        rows = len(data) // COLUMNS
+        return data[: rows * COLUMNS].reshape(rows, COLUMNS)
+
+    def window(self, ticker, timeframe, start_ms=None):
+        """
+        Returns an in-memory copy of the candles at or after start_ms.
+        """
+        data = self.read(ticker, timeframe)
+        if start_ms is not None and len(data):
+            data = data[np.searchsorted(data[:, 0], start_ms):]
+        return np.array(data)
+
+    def last_timestamp(self, ticker, timeframe):
+        data = self.read(ticker, timeframe)
+        return float(data[-1, 0]) if len(data) else None
+
+    def covered_from(self, ticker, timeframe):
+        """
+        Earliest timestamp we have already asked upstream for. Upstream may
+        simply have nothing before the first stored candle (listing date,
+        weekends), so this is tracked separately from the data.
+        """
+        try:
+            with open(self._meta_path(ticker, timeframe)) as f:
+                return json.load(f).get("covered_from")
+        except (OSError, ValueError):
+            return None
+
+    def merge(self, ticker, timeframe, rows):
+        """
+        Appends rows newer than what is stored. Returns the number of
+        candles written.
+        """
+        rows = _as_rows(rows)
+        if not len(rows):
+            return 0
+
+        with self._locked(ticker, timeframe):
+            return self._merge(ticker, timeframe, rows)
+
+    def _merge(self, ticker, timeframe, rows):
+        path = self._path(ticker, timeframe)
+        last = self.last_timestamp(ticker, timeframe)
+        if last is None:
+            self._write(path, rows)
+            return len(rows)
+
+        rows = rows[rows[:, 0] >= last]
+        if not len(rows):
+            return 0
+
+        rewrite_last = rows[0, 0] == last
+        with open(path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell() - f.tell() % (COLUMNS * 8)
+            if rewrite_last:
+                end -= COLUMNS * 8
+            f.seek(end)
+            f.write(rows.astype("<f8").tobytes())
+            f.truncate()
+        return len(rows)
+
+    def replace(self, ticker, timeframe, rows, covered_from=None):
+        rows = _as_rows(rows)
+        with self._locked(ticker, timeframe):
+            self._write(self._path(ticker, timeframe), rows)
+
+        if covered_from is not None:
+            self.set_covered_from(ticker, timeframe, covered_from)
+
+    def _write(self, path, rows):
+        # Readers holding a memmap of the old file keep seeing it intact
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(rows.astype("<f8").tobytes())
+        os.replace(tmp, path)
+
+    def set_covered_from(self, ticker, timeframe, covered_from):
+        path = self._meta_path(ticker, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"covered_from": covered_from}, f)
+        os.replace(tmp, path)
+
+
+def _as_rows(rows):
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, COLUMNS)
+    # Upstream leaves holes (halted sessions, missing volume); a candle
+    # without a close is useless, other gaps fall back to the close / 0.
+    rows = rows[~np.isnan(rows[:, 4])]
+    rows[:, 1:4] = np.where(np.isnan(rows[:, 1:4]), rows[:, 4:5], rows[:, 1:4])
+    rows[:, 5] = np.nan_to_num(rows[:, 5])
+    if len(rows) > 1:
+        # Sort by time and drop duplicate timestamps, keeping the last one
+        rows = rows[np.argsort(rows[:, 0], kind="stable")]
+        keep = np.append(rows[1:, 0] != rows[:-1, 0], True)
+        rows = rows[keep]
+    return rows
@@ -0,0 +1,78 @@
+import numpy as np
+
+# Selects which candles to keep when a history window has more bars than the
+# client can draw. Both algorithms work on the close series and return row
+# indices, so the output is still a subset of real candles.
+
+ALGORITHMS = ("lttb", "minmax")
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last point and, per
+    bucket, the point forming the largest triangle with the previously kept
+    point and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average point of every bucket, vectorised with cumulative sums
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    avg_x = (cx[ends] - cx[starts]) / counts
+    avg_y = (cy[ends] - cy[starts]) / counts
+    # The last bucket looks ahead at the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    # Each choice depends on the previous one, so only the bucket loop is
+    # sequential; the work inside a bucket is vectorised.
+    for i in range(n_out - 2):
+        bx = x[starts[i]:ends[i]]
+        by = y[starts[i]:ends[i]]
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = starts[i] + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """
+    Min/max bucketing: keeps the lowest and highest point of each bucket so
+    no visible peak or trough is lost.
+    """
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+
+    # Pad to a whole number of buckets with edge values, then take
+    # argmin/argmax of every bucket in one pass
+    size = -(-n // buckets)
+    padded = np.pad(y, (0, size * buckets - n), mode="edge").reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = np.minimum(offsets + padded.argmin(axis=1), n - 1)
+    highs = np.minimum(offsets + padded.argmax(axis=1), n - 1)
+    return np.unique(np.concatenate((lows, highs)))
+
+
+def downsample(candles, max_points, algorithm="lttb"):
+    """
+    Reduces an (n, 6) candle array to at most max_points rows.
+    """
+    if not max_points or len(candles) <= max_points:
+        return candles
+    if algorithm == "minmax":
+        idx = minmax_indices(candles[:, 4], max_points)
+    else:
+        idx = lttb_indices(candles[:, 0], candles[:, 4], max_points)
+    return candles[idx]
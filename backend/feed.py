@@ -0,0 +1,334 @@
+"""
+Shared market data feed for multi-process serving.
+
+One feed process owns the MarketDataService: its upstream clients, rate
+limits, history cache and instrument registry. It publishes ticks over a
+Unix socket and answers history, quote, search and stats calls on the same
+connection. Every API worker talks to it through a FeedClient, which stands
+in for the MarketDataService, so upstream load and the upstream request
+budget stay the same no matter how many workers serve clients.
+
+Wire protocol, one JSON object per line:
+    worker -> feed: {"op": "subscribe" | "unsubscribe", "symbol": "BTC/USDT"}
+    feed -> worker: {"symbol": "BTC/USDT", "data": {...tick...}}
+    worker -> feed: {"op": "call", "id": 7, "method": "quotes", "args": [...]}
+                    {"op": "cancel", "id": 7}
+    feed -> worker: {"id": 7, "result": ...} or {"id": 7, "error": "..."}
+
+numpy arrays in results are sent as {"array": base64 float64, "shape": [...]}.
+
+    python feed.py --socket /tmp/baku-feed.sock
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import os
+import numpy as np
+import metrics
+from hub import SubscriptionHub
+from market_data import MarketDataService, normalize_ticker
+from metrics import record_error
+
+FEED_SOCKET = os.getenv("BAKU_FEED_SOCKET")
+RECONNECT_DELAY = 1.0
+# How long a call waits for the feed to (re)connect before failing
+CONNECT_TIMEOUT = 5.0
+# Longest line either side accepts; full-resolution history is a few MB
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+class FeedError(Exception):
+    pass
+
+
+def _pack(value):
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value, dtype="<f8")
+        return {"array": base64.b64encode(value.tobytes()).decode(), "shape": value.shape}
+    if isinstance(value, (list, tuple)):
+        return [_pack(v) for v in value]
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, dict) and "array" in value:
+        return np.frombuffer(base64.b64decode(value["array"]), dtype="<f8").reshape(value["shape"]).copy()
+    if isinstance(value, list):
+        return [_unpack(v) for v in value]
+    return value
+
+
+class FeedServer:
+    """
+    Serves hub updates to worker processes. Each worker connection holds at
+    most one unsent tick per symbol, so a stalled worker cannot make the
+    feed buffer without bound.
+    """
+
+    def __init__(self, market_service, path):
+        self.market_service = market_service
+        self.hub = SubscriptionHub(market_service)
+        self.path = path
+        self.workers = 0
+        self.methods = {
+            "history": market_service.get_history,
+            "history_with_indicators": market_service.get_history_with_indicators,
+            "quotes": market_service.get_quotes,
+            "search": market_service.search_assets,
+            "stats": market_service.stats,
+            "metrics": self._metrics,
+        }
+
+    async def _metrics(self):
+        return metrics.render()
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, path=self.path, limit=LINE_LIMIT)
+        print(f"Market data feed listening on {self.path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        self.workers += 1
+        callbacks = {}  # symbol -> hub callback
+        pending = {}  # symbol -> latest unsent tick
+        calls = {}  # request id -> task answering it
+        ready = asyncio.Event()
+
+        def make_callback(symbol):
+            def on_update(data):
+                pending[symbol] = data
+                ready.set()
+            return on_update
+
+        async def write_loop():
+            while True:
+                await ready.wait()
+                ready.clear()
+                lines = [json.dumps({"symbol": s, "data": d}) + "\n" for s, d in pending.items()]
+                pending.clear()
+                writer.write("".join(lines).encode())
+                await writer.drain()
+
+        sender = asyncio.create_task(write_loop())
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    op, symbol = message["op"], message.get("symbol")
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    record_error("feed.protocol", e)
+                    continue
+
+                if op == "call":
+                    request_id = message.get("id")
+                    calls[request_id] = asyncio.create_task(self._call(writer, message))
+                    calls[request_id].add_done_callback(lambda _, i=request_id: calls.pop(i, None))
+                elif op == "cancel" and message.get("id") in calls:
+                    # The worker's client went away
+                    calls[message["id"]].cancel()
+                elif op == "subscribe" and symbol not in callbacks:
+                    callbacks[symbol] = make_callback(symbol)
+                    self.hub.subscribe(symbol, callbacks[symbol])
+                elif op == "unsubscribe" and symbol in callbacks:
+                    self.hub.unsubscribe(symbol, callbacks.pop(symbol))
+                    pending.pop(symbol, None)
+        except ConnectionError:
+            pass
+        finally:
+            sender.cancel()
+            for task in list(calls.values()):
+                task.cancel()
+            for symbol, callback in callbacks.items():
+                self.hub.unsubscribe(symbol, callback)
+            writer.close()
+            self.workers -= 1
+
+    async def _call(self, writer, message):
+        request_id = message.get("id")
+        try:
+            method = self.methods[message["method"]]
+            reply = {"id": request_id, "result": _pack(await method(*message.get("args", ())))}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record_error("feed.call", e)
+            reply = {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+        try:
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class FeedClient:
+    """
+    Worker-side stand-in for the MarketDataService: stream_ticker() yields
+    ticks published by the feed process instead of polling upstream itself,
+    and history, quotes, search and stats are calls into the feed.
+    Reconnects and re-subscribes if the feed restarts; calls in flight when
+    the connection drops fail with FeedError.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.queues = {}  # symbol -> queue of the active stream_ticker
+        self.calls = {}  # request id -> future of the reply
+        self.writer = None
+        self.task = None
+        self.connected = asyncio.Event()
+        self._ids = itertools.count(1)
+
+    def normalize_ticker(self, ticker):
+        return normalize_ticker(ticker)
+
+    def _start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stream_ticker(self, symbol):
+        self._start()
+
+        # Newest tick only; the hub fans it out right away anyway
+        queue = asyncio.Queue(maxsize=1)
+        self.queues[symbol] = queue
+        await self._send({"op": "subscribe", "symbol": symbol})
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            if self.queues.get(symbol) is queue:
+                del self.queues[symbol]
+                await self._send({"op": "unsubscribe", "symbol": symbol})
+
+    async def call(self, method, *args):
+        self._start()
+        try:
+            await asyncio.wait_for(self.connected.wait(), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise FeedError(f"feed at {self.path} is not reachable")
+        request_id = next(self._ids)
+        future = self.calls[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self._send({"op": "call", "id": request_id, "method": method, "args": args})
+            return _unpack(await future)
+        except asyncio.CancelledError:
+            # Let the feed drop the work too, e.g. a disconnected /history client
+            self._write({"op": "cancel", "id": request_id})
+            raise
+        finally:
+            self.calls.pop(request_id, None)
+
+    async def get_history(self, ticker, period="1d", interval="1m", max_points=None, algorithm="lttb"):
+        return await self.call("history", ticker, period, interval, max_points, algorithm)
+
+    async def get_history_with_indicators(self, ticker, period, interval, specs, max_points=None, algorithm="lttb"):
+        return await self.call("history_with_indicators", ticker, period, interval, specs, max_points, algorithm)
+
+    async def get_quotes(self, tickers):
+        return await self.call("quotes", tickers)
+
+    async def search_assets(self, query):
+        return await self.call("search", query)
+
+    async def stats(self):
+        return await self.call("stats")
+
+    async def metrics(self):
+        """
+        The feed process's metrics, rendered in the Prometheus text format.
+        """
+        return await self.call("metrics")
+
+    def _write(self, message):
+        if self.writer is None:
+            return False
+        self.writer.write((json.dumps(message) + "\n").encode())
+        return True
+
+    async def _send(self, message):
+        # Subscriptions are replayed once the connection is up
+        try:
+            if self._write(message):
+                await self.writer.drain()
+        except ConnectionError as e:
+            record_error("feed.client", e)
+
+    async def _run(self):
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+                self.connected.set()
+                for symbol in list(self.queues):
+                    await self._send({"op": "subscribe", "symbol": symbol})
+
+                while line := await reader.readline():
+                    message = json.loads(line)
+                    if "id" in message:
+                        future = self.calls.get(message["id"])
+                        if future is None or future.done():
+                            continue
+                        if "error" in message:
+                            future.set_exception(FeedError(message["error"]))
+                        else:
+                            future.set_result(message["result"])
+                        continue
+                    queue = self.queues.get(message["symbol"])
+                    if queue is None:
+                        continue
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                record_error("feed.client", e)
+                print(f"Feed connection error: {e}")
+            self.writer = None
+            self.connected.clear()
+            for future in self.calls.values():
+                if not future.done():
+                    future.set_exception(FeedError("feed connection lost"))
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        if self.writer:
+            self.writer.close()
+
+
+async def run_feed(path):
+    market_service = MarketDataService()
+    market_service.register_metrics()
+    server = FeedServer(market_service, path)
+    background = [
+        asyncio.create_task(market_service.load_instruments()),
+        asyncio.create_task(metrics.watch_event_loop()),
+    ]
+    try:
+        await server.serve()
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await server.hub.close()
+        await market_service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=FEED_SOCKET or "/tmp/baku-feed.sock")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_feed(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
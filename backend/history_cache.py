@@ -0,0 +1,136 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+# How long a history response stays fresh, by bar interval (seconds).
+# Short bars change every few seconds, daily and longer bars barely move.
+INTERVAL_TTL = {
+    "1m": 10, "2m": 20, "5m": 30, "15m": 60, "30m": 120,
+    "60m": 300, "90m": 300, "1h": 300, "4h": 900,
+    "1d": 3600, "5d": 3 * 3600, "1wk": 6 * 3600, "1w": 6 * 3600,
+    "1mo": 12 * 3600, "1M": 12 * 3600, "3mo": 12 * 3600,
+}
+DEFAULT_TTL = 60
+
+# Rough in-memory footprint of one {"time", "value"} point, used when the
+# cached value does not report its own size.
+POINT_BYTES = 200
+
+
+def ttl_for_interval(interval):
+    return INTERVAL_TTL.get(interval, DEFAULT_TTL)
+
+
+def estimate_size(value):
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) or POINT_BYTES
+    if isinstance(value, (list, tuple)):
+        return len(value) * POINT_BYTES or POINT_BYTES
+    return POINT_BYTES
+
+
+class HistoryCache:
+    """
+    TTL + LRU cache for history responses, bounded by approximate memory use.
+
+    get() coalesces concurrent misses on the same key: the first caller runs
+    the loader, everyone else awaits the same fetch. The fetch is only
+    cancelled once every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at, size, value)
+        self.inflight = {}  # key -> task
+        self.waiters = {}  # key -> callers awaiting the in-flight task
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.cancelled = 0
+
+    async def get(self, key, ttl, loader):
+        entry = self.entries.get(key)
+        if entry:
+            expires_at, _, value = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return value
+            self.expirations += 1
+            self._remove(key)
+
+        task = self.inflight.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, ttl, loader))
+            self.inflight[key] = task
+
+        # Shield so one disconnecting client does not cancel the fetch
+        # the other waiters are sharing; the last one to leave does.
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.waiters[key] == 1 and not task.done():
+                task.cancel()
+                self.cancelled += 1
+                # New callers start a fresh fetch instead of joining this one
+                if self.inflight.get(key) is task:
+                    del self.inflight[key]
+            raise
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+    async def _load(self, key, ttl, loader):
+        try:
+            value = await loader()
+            # Empty results are how upstream errors surface, don't pin them
+            if value is not None and len(value):
+                self.put(key, value, ttl)
+            return value
+        finally:
+            if self.inflight.get(key) is asyncio.current_task():
+                del self.inflight[key]
+
+    def put(self, key, value, ttl):
+        if key in self.entries:
+            self._remove(key)
+
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        self.entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self.inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
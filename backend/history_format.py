@@ -0,0 +1,94 @@
+import json
+import numpy as np
+from fastapi import Response
+
+# Column names for the [timestamp_ms, open, high, low, close, volume] rows
+# produced by the candle store.
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def _json_values(values):
+    # Indicators are NaN while warming up; JSON has no NaN
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def to_rows(candles, indicators=None):
+    """
+    Legacy [{"time": seconds, "value": close}, ...] format. Indicator
+    values, given as (column names, (n, k) values), become extra keys.
+    """
+    times = (candles[:, 0] / 1000).tolist()
+    closes = candles[:, 4].tolist()
+    rows = [{"time": t, "value": v} for t, v in zip(times, closes)]
+    if indicators:
+        names, values = indicators
+        for i, name in enumerate(names):
+            for row, value in zip(rows, _json_values(values[:, i])):
+                row[name] = value
+    return rows
+
+
+def to_columns(candles, indicators=None):
+    """
+    Columnar {"time": [...], "open": [...], ..., "volume": [...]} format,
+    plus {"indicators": {column: [...]}} when indicators are given.
+    """
+    columns = {"time": (candles[:, 0] / 1000).tolist()}
+    for i, field in enumerate(FIELDS, start=1):
+        columns[field] = candles[:, i].tolist()
+    if indicators:
+        names, values = indicators
+        columns["indicators"] = {name: _json_values(values[:, i]) for i, name in enumerate(names)}
+    return columns
+
+
+def to_msgpack(candles, indicators=None):
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedFormat("msgpack is not installed")
+    return msgpack.packb(to_columns(candles, indicators))
+
+
+def to_arrow(candles, indicators=None):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedFormat("pyarrow is not installed")
+
+    arrays = [pa.array(candles[:, 0] / 1000)]
+    arrays += [pa.array(np.ascontiguousarray(candles[:, i])) for i in range(1, len(FIELDS) + 1)]
+    names = ["time"] + FIELDS
+    if indicators:
+        # Columns keep their NaNs here, Arrow readers handle them natively
+        arrays += [pa.array(np.ascontiguousarray(column)) for column in indicators[1].T]
+        names += list(indicators[0])
+    table = pa.Table.from_arrays(arrays, names=names)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def history_response(candles, fmt="rows", accept="", indicators=None):
+    """
+    Encodes candles for /history. Binary encodings are picked through the
+    Accept header and are always columnar; JSON defaults to the legacy row
+    format unless fmt == "columns".
+    """
+    accept = (accept or "").lower()
+    if any(t in accept for t in MSGPACK_TYPES):
+        return Response(to_msgpack(candles, indicators), media_type=MSGPACK_TYPES[0])
+    if ARROW_TYPE in accept:
+        return Response(to_arrow(candles, indicators), media_type=ARROW_TYPE)
+
+    body = to_columns(candles, indicators) if fmt == "columns" else to_rows(candles, indicators)
+    return Response(json.dumps(body, separators=(",", ":")), media_type="application/json")
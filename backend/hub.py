@@ -0,0 +1,219 @@
+import asyncio
+import time
+import numpy as np
+from bars import BarBuilder, TIMEFRAMES, bar_to_dict
+from candle_store import EMPTY as EMPTY_CANDLES
+from indicators import IndicatorSet, uses_volume
+from metrics import record_error
+
+# History window live indicators are warmed up from, per bar timeframe.
+# 1s bars have no upstream history and start from the live bars alone.
+SEED_PERIODS = {"1m": "1d", "5m": "5d", "1h": "3mo"}
+
+
+class SubscriptionHub:
+    """
+    Runs one upstream poller per active ticker and fans every update out to
+    all of its subscribers. Pollers are reference counted: the first
+    subscriber starts one, the last one to leave stops it.
+
+    source is anything with normalize_ticker() and stream_ticker(): the
+    MarketDataService itself, or a FeedClient when a separate feed process
+    owns the upstream connections. history (the MarketDataService) is
+    used to warm up live indicators.
+    """
+
+    def __init__(self, source, history=None):
+        self.source = source
+        self.history = history
+        self.subscribers = {}  # symbol -> set of callbacks
+        self.tasks = {}  # symbol -> poller task
+        self.latest = {}  # symbol -> last update sent
+        self.bar_builders = {}  # symbol -> BarBuilder fed by the poller
+        self.bar_listeners = {}  # symbol -> {callback: set of timeframes}
+        self.indicator_sets = {}  # (symbol, timeframe) -> IndicatorSet
+        self.seed_tasks = set()
+
+    def subscribe(self, ticker, callback):
+        """
+        Registers callback(data) for updates on ticker and returns the
+        normalized symbol to pass back to unsubscribe().
+        """
+        symbol = self.normalize_ticker(ticker)
+        callbacks = self.subscribers.setdefault(symbol, set())
+        callbacks.add(callback)
+
+        if symbol not in self.tasks:
+            self.tasks[symbol] = asyncio.create_task(self._poll(symbol))
+        elif symbol in self.latest:
+            # Late joiners get the last known value right away instead of
+            # waiting for the next upstream tick.
+            callback(self.latest[symbol])
+
+        return symbol
+
+    def normalize_ticker(self, ticker):
+        symbol, _ = self.source.normalize_ticker(ticker)
+        return symbol
+
+    def unsubscribe(self, symbol, callback):
+        callbacks = self.subscribers.get(symbol)
+        if not callbacks:
+            return
+        callbacks.discard(callback)
+
+        if not callbacks:
+            del self.subscribers[symbol]
+            self.latest.pop(symbol, None)
+            self.bar_builders.pop(symbol, None)
+            self.bar_listeners.pop(symbol, None)
+            for tf in TIMEFRAMES:
+                self.indicator_sets.pop((symbol, tf), None)
+            task = self.tasks.pop(symbol, None)
+            if task:
+                task.cancel()
+
+    def live_indicators(self, symbol, specs):
+        """
+        The specs that can be computed on symbol's live bars. Only crypto
+        ticks carry volume, so volume-weighted indicators are left out for
+        everything else rather than freezing at their seeded value.
+        """
+        _, is_crypto = self.source.normalize_ticker(symbol)
+        return [s for s in specs if is_crypto or not uses_volume(s)]
+
+    def subscribe_bars(self, symbol, timeframes, callback, indicators=()):
+        """
+        Registers callback(event) for live bar events of an already
+        subscribed symbol and returns the recent bars per timeframe, so the
+        caller can paint a chart without a /history round trip.
+
+        indicators are canonical specs (see indicators.parse_indicators);
+        their values are computed once per bar event, for every listener
+        of that series, and carried in the event's "indicators" field.
+        Specs live_indicators() rejects are ignored.
+        """
+        timeframes = [tf for tf in TIMEFRAMES if tf in timeframes]
+        indicators = self.live_indicators(symbol, indicators)
+        listeners = self.bar_listeners.setdefault(symbol, {})
+        listeners.setdefault(callback, set()).update(timeframes)
+
+        if indicators:
+            for tf in timeframes:
+                indicator_set = self.indicator_sets.setdefault((symbol, tf), IndicatorSet())
+                new = indicator_set.add(callback, indicators)
+                if new:
+                    task = asyncio.create_task(self._seed_indicators(symbol, tf, indicator_set, new))
+                    self.seed_tasks.add(task)
+                    task.add_done_callback(self.seed_tasks.discard)
+
+        builder = self.bar_builders.get(symbol)
+        return {tf: builder.recent(tf) if builder else EMPTY_CANDLES for tf in timeframes}
+
+    def unsubscribe_bars(self, symbol, callback):
+        listeners = self.bar_listeners.get(symbol)
+        if listeners:
+            listeners.pop(callback, None)
+        for tf in TIMEFRAMES:
+            indicator_set = self.indicator_sets.get((symbol, tf))
+            if indicator_set and indicator_set.remove(callback):
+                del self.indicator_sets[(symbol, tf)]
+
+    async def _seed_indicators(self, symbol, timeframe, indicator_set, specs):
+        """
+        Primes new indicators from upstream history followed by the bars
+        built live so far. Until then they are left out of bar events.
+        """
+        history = EMPTY_CANDLES
+        period = SEED_PERIODS.get(timeframe)
+        if self.history is not None and period:
+            try:
+                history = await self.history.get_history(symbol, period, timeframe)
+            except Exception as e:
+                record_error("hub.indicators", e)
+                print(f"Error loading {symbol} history for indicators: {e}")
+
+        # Only closed bars count: history up to the bar still forming (that
+        # one is left for on_bar), then any live bars history doesn't have
+        # yet. The first live bar is usually partial, history's isn't.
+        builder = self.bar_builders.get(symbol)
+        live = builder.recent(timeframe) if builder else EMPTY_CANDLES
+        if len(live):
+            forming = live[-1, 0]
+        else:
+            width = TIMEFRAMES[timeframe] * 1000
+            forming = time.time() * 1000 // width * width
+        history = history[history[:, 0] < forming]
+        closed = live[:-1]
+        if len(history):
+            closed = closed[closed[:, 0] > history[-1, 0]]
+        candles = np.concatenate([history, closed])
+        for spec in specs:
+            try:
+                indicator_set.seed(spec, candles)
+            except Exception as e:
+                record_error("hub.indicators", e)
+                print(f"Error seeding {spec} for {symbol}: {e}")
+
+    def _publish_bars(self, symbol, data):
+        builder = self.bar_builders.setdefault(symbol, BarBuilder())
+        events = builder.on_tick(data.get("price"), data.get("timestamp"), data.get("base_volume"))
+
+        listeners = self.bar_listeners.get(symbol)
+        if not listeners:
+            return
+        for tf, row, closed in events:
+            event = {
+                "type": "bar",
+                "ticker": symbol,
+                "timeframe": tf,
+                "closed": closed,
+                "bar": bar_to_dict(row),
+            }
+            indicator_set = self.indicator_sets.get((symbol, tf))
+            if indicator_set:
+                event["indicators"] = indicator_set.on_bar(row, closed)
+            for callback, timeframes in list(listeners.items()):
+                if tf in timeframes:
+                    callback(event)
+
+    async def _poll(self, symbol):
+        try:
+            async for data in self.source.stream_ticker(symbol):
+                self.latest[symbol] = data
+                # Copy, callbacks may unsubscribe while we iterate
+                for callback in list(self.subscribers.get(symbol, ())):
+                    try:
+                        callback(data)
+                    except Exception as e:
+                        record_error("hub.deliver", e)
+                        print(f"Error delivering {symbol} update: {e}")
+                try:
+                    self._publish_bars(symbol, data)
+                except Exception as e:
+                    record_error("hub.bars", e)
+                    print(f"Error building {symbol} bars: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record_error("hub.poll", e)
+            print(f"Poller for {symbol} stopped: {e}")
+            # Let the next subscriber start a fresh poller
+            if self.tasks.get(symbol) is asyncio.current_task():
+                del self.tasks[symbol]
+
+    async def close(self):
+        """
+        Stops every poller, e.g. on shutdown.
+        """
+        tasks = list(self.tasks.values()) + list(self.seed_tasks)
+        self.tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "tickers": len(self.tasks),
+            "subscriptions": {symbol: len(cbs) for symbol, cbs in self.subscribers.items()},
+        }
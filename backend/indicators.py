@@ -0,0 +1,457 @@
+import abc
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Technical indicators over [timestamp_ms, open, high, low, close, volume]
+# candles. Every indicator can be computed two ways that agree with each
+# other: batch() over a whole history window with vectorised numpy/pandas,
+# and incrementally bar by bar (seed() once from closed history, then
+# push() per closed bar and peek() for the bar still forming), which is
+# O(1) per tick.
+#
+# Indicators are requested as specs like "sma:20", "ema:50", "rsi:14",
+# "bb:20:2" or "vwap". Indicators with several lines (Bollinger) report
+# one column per line, e.g. "bb:20:2.upper".
+
+MAX_INDICATORS = 10
+MAX_PERIOD = 1000
+
+
+class InvalidIndicator(ValueError):
+    pass
+
+
+def _window_sums(values, period):
+    """
+    Sum and sum of squares of every trailing window, shifted by the first
+    value so the squares stay small relative to the variance.
+    """
+    shifted = values - values[0]
+    cs = np.concatenate(([0.0], np.cumsum(shifted)))
+    cs2 = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    return cs[period:] - cs[:-period], cs2[period:] - cs2[:-period], values[0]
+
+
+class _Window:
+    """
+    The last `period` closes with running sums; resummed every `period`
+    appends so float error can't build up.
+    """
+
+    def __init__(self, period, closes):
+        self.period = period
+        self.values = deque(closes[-period:], maxlen=period)
+        self.ref = float(self.values[0]) if self.values else 0.0
+        self.appends = 0
+        self._resum()
+
+    def _resum(self):
+        shifted = np.asarray(self.values, dtype=np.float64) - self.ref
+        self.sum = float(shifted.sum())
+        self.sumsq = float((shifted * shifted).sum())
+
+    def stats_with(self, x):
+        """
+        (mean, variance) of the window after appending x, or None while
+        there are fewer than `period` closes.
+        """
+        if len(self.values) + 1 < self.period:
+            return None
+        total, totalsq = self.sum + (x - self.ref), self.sumsq + (x - self.ref) ** 2
+        if len(self.values) == self.period:
+            oldest = self.values[0] - self.ref
+            total -= oldest
+            totalsq -= oldest * oldest
+        mean = total / self.period
+        return mean + self.ref, max(totalsq / self.period - mean * mean, 0.0)
+
+    def append(self, x):
+        if not self.values:
+            self.ref = x
+        if len(self.values) == self.period:
+            oldest = self.values[0] - self.ref
+            self.sum -= oldest
+            self.sumsq -= oldest * oldest
+        self.values.append(x)
+        self.sum += x - self.ref
+        self.sumsq += (x - self.ref) ** 2
+        self.appends += 1
+        if self.appends % self.period == 0:
+            self._resum()
+
+
+class Indicator(abc.ABC):
+    """
+    outputs names the lines an indicator draws; values are reported in
+    that order, None (NaN in batch results) while warming up.
+    """
+
+    name = None
+    defaults = ()
+    outputs = ("",)
+    # Whether values depend on bar volume
+    uses_volume = False
+
+    def __init__(self, *params):
+        self.params = params
+
+    @abc.abstractmethod
+    def batch(self, candles):
+        """(n, len(outputs)) array of values for every candle."""
+
+    @abc.abstractmethod
+    def seed(self, candles):
+        """Resets the incremental state to the end of closed candles."""
+
+    @abc.abstractmethod
+    def peek(self, row):
+        """Values with row appended, without committing it."""
+
+    @abc.abstractmethod
+    def _commit(self, row):
+        """Appends a closed bar to the incremental state."""
+
+    def push(self, row):
+        values = self.peek(row)
+        self._commit(row)
+        return values
+
+
+class _WindowIndicator(Indicator):
+    def seed(self, candles):
+        self.window = _Window(self.period, candles[:, 4].tolist())
+
+    def _commit(self, row):
+        self.window.append(row[4])
+
+
+class SMA(_WindowIndicator):
+    name = "sma"
+    defaults = (20,)
+
+    def __init__(self, period):
+        super().__init__(period)
+        self.period = period
+
+    def batch(self, candles):
+        out = np.full((len(candles), 1), np.nan)
+        if len(candles) >= self.period:
+            sums, _, ref = _window_sums(candles[:, 4], self.period)
+            out[self.period - 1:, 0] = sums / self.period + ref
+        return out
+
+    def peek(self, row):
+        stats = self.window.stats_with(row[4])
+        return (None,) if stats is None else (stats[0],)
+
+
+class Bollinger(_WindowIndicator):
+    name = "bb"
+    defaults = (20, 2.0)
+    outputs = ("mid", "upper", "lower")
+
+    def __init__(self, period, width):
+        super().__init__(period, width)
+        self.period = period
+        self.width = width
+
+    def batch(self, candles):
+        out = np.full((len(candles), 3), np.nan)
+        if len(candles) >= self.period:
+            sums, sumsqs, ref = _window_sums(candles[:, 4], self.period)
+            mean = sums / self.period
+            std = np.sqrt(np.maximum(sumsqs / self.period - mean * mean, 0.0))
+            mean += ref
+            out[self.period - 1:] = np.column_stack([mean, mean + self.width * std, mean - self.width * std])
+        return out
+
+    def peek(self, row):
+        stats = self.window.stats_with(row[4])
+        if stats is None:
+            return (None, None, None)
+        mean, var = stats
+        band = self.width * math.sqrt(var)
+        return (mean, mean + band, mean - band)
+
+
+class EMA(Indicator):
+    name = "ema"
+    defaults = (20,)
+
+    def __init__(self, period):
+        super().__init__(period)
+        self.period = period
+        self.alpha = 2 / (period + 1)
+
+    def _smooth(self, closes):
+        return pd.Series(closes).ewm(alpha=self.alpha, adjust=False).mean().to_numpy(copy=True)
+
+    def batch(self, candles):
+        ema = self._smooth(candles[:, 4])
+        ema[: self.period - 1] = np.nan
+        return ema.reshape(-1, 1)
+
+    def seed(self, candles):
+        self.count = len(candles)
+        self.ema = float(self._smooth(candles[:, 4])[-1]) if self.count else None
+
+    def _next(self, close):
+        return close if self.ema is None else self.alpha * close + (1 - self.alpha) * self.ema
+
+    def peek(self, row):
+        return (self._next(row[4]) if self.count + 1 >= self.period else None,)
+
+    def _commit(self, row):
+        self.ema = self._next(row[4])
+        self.count += 1
+
+
+class RSI(Indicator):
+    """
+    Wilder's RSI: gains and losses smoothed with alpha = 1 / period.
+    """
+
+    name = "rsi"
+    defaults = (14,)
+
+    def __init__(self, period):
+        super().__init__(period)
+        self.period = period
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100 - 100 / (1 + gain / loss)
+        # No losses at all is 100, a flat window 50
+        return np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), rsi)
+
+    @staticmethod
+    def _rsi_one(gain, loss):
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+    def _averages(self, closes):
+        diff = np.diff(closes)
+        smooth = lambda x: pd.Series(x).ewm(alpha=1 / self.period, adjust=False).mean().to_numpy()
+        return smooth(np.maximum(diff, 0)), smooth(np.maximum(-diff, 0))
+
+    def batch(self, candles):
+        out = np.full((len(candles), 1), np.nan)
+        if len(candles) > self.period:
+            gain, loss = self._averages(candles[:, 4])
+            out[self.period:, 0] = self._rsi(gain, loss)[self.period - 1:]
+        return out
+
+    def seed(self, candles):
+        self.count = len(candles)
+        self.prev = float(candles[-1, 4]) if self.count else None
+        self.gain = self.loss = None
+        if self.count > 1:
+            gain, loss = self._averages(candles[:, 4])
+            self.gain, self.loss = float(gain[-1]), float(loss[-1])
+
+    def _next(self, close):
+        diff = close - self.prev
+        gain, loss = max(diff, 0.0), max(-diff, 0.0)
+        if self.gain is None:
+            return gain, loss
+        a = 1 / self.period
+        return a * gain + (1 - a) * self.gain, a * loss + (1 - a) * self.loss
+
+    def peek(self, row):
+        if self.prev is None or self.count < self.period:
+            return (None,)
+        gain, loss = self._next(row[4])
+        return (self._rsi_one(gain, loss),)
+
+    def _commit(self, row):
+        if self.prev is not None:
+            self.gain, self.loss = self._next(row[4])
+        self.prev = row[4]
+        self.count += 1
+
+
+class VWAP(Indicator):
+    """
+    Volume-weighted typical price, anchored at each UTC day.
+    """
+
+    name = "vwap"
+    uses_volume = True
+
+    @staticmethod
+    def _day(timestamp_ms):
+        return timestamp_ms // 86_400_000
+
+    def batch(self, candles):
+        out = np.full((len(candles), 1), np.nan)
+        if not len(candles):
+            return out
+        typical = candles[:, 2:5].mean(axis=1)
+        volume = candles[:, 5]
+        cpv = np.concatenate(([0.0], np.cumsum(typical * volume)))
+        cv = np.concatenate(([0.0], np.cumsum(volume)))
+        # Index of the first bar of each bar's day
+        days = self._day(candles[:, 0])
+        idx = np.arange(len(candles))
+        starts = np.maximum.accumulate(np.where(np.append(True, days[1:] != days[:-1]), idx, 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:, 0] = (cpv[idx + 1] - cpv[starts]) / (cv[idx + 1] - cv[starts])
+        out[~np.isfinite(out)] = np.nan
+        return out
+
+    def seed(self, candles):
+        self.day, self.pv, self.volume = None, 0.0, 0.0
+        if len(candles):
+            self.day = self._day(candles[-1, 0])
+            today = candles[self._day(candles[:, 0]) == self.day]
+            self.pv = float((today[:, 2:5].mean(axis=1) * today[:, 5]).sum())
+            self.volume = float(today[:, 5].sum())
+
+    def _next(self, row):
+        pv = (row[2] + row[3] + row[4]) / 3 * row[5]
+        if self._day(row[0]) == self.day:
+            return self.pv + pv, self.volume + row[5]
+        return pv, row[5]
+
+    def peek(self, row):
+        pv, volume = self._next(row)
+        return (pv / volume if volume > 0 else None,)
+
+    def _commit(self, row):
+        self.pv, self.volume = self._next(row)
+        self.day = self._day(row[0])
+
+
+KINDS = {cls.name: cls for cls in (SMA, EMA, RSI, Bollinger, VWAP)}
+
+
+def _format_param(value):
+    return format(value, "g")
+
+
+def parse_indicators(specs):
+    """
+    Validates "sma:20,rsi" (or a list of such specs) and returns canonical
+    specs with defaults filled in, in request order without duplicates.
+    """
+    if isinstance(specs, str):
+        specs = specs.split(",")
+    canonical = []
+    for spec in specs:
+        parts = str(spec).strip().lower().split(":")
+        if not parts[0]:
+            continue
+        cls = KINDS.get(parts[0])
+        if cls is None:
+            raise InvalidIndicator(f"unknown indicator {parts[0]!r}, expected one of {', '.join(KINDS)}")
+        raw = parts[1:]
+        if len(raw) > len(cls.defaults):
+            raise InvalidIndicator(f"{cls.name} takes at most {len(cls.defaults)} parameters")
+
+        params = []
+        for i, default in enumerate(cls.defaults):
+            try:
+                value = type(default)(raw[i]) if i < len(raw) and raw[i] else default
+            except ValueError:
+                raise InvalidIndicator(f"invalid parameter {raw[i]!r} for {cls.name}")
+            if not 0 < value <= MAX_PERIOD:
+                raise InvalidIndicator(f"{cls.name} parameters must be between 0 and {MAX_PERIOD}")
+            if isinstance(default, int) and value < 2:
+                raise InvalidIndicator(f"{cls.name} period must be at least 2")
+            params.append(value)
+
+        name = ":".join([cls.name] + [_format_param(p) for p in params])
+        if name not in canonical:
+            canonical.append(name)
+    if len(canonical) > MAX_INDICATORS:
+        raise InvalidIndicator(f"at most {MAX_INDICATORS} indicators per request")
+    return canonical
+
+
+def create(spec):
+    """
+    Indicator instance for a canonical spec from parse_indicators().
+    """
+    name, *params = spec.split(":")
+    cls = KINDS[name]
+    return cls(*(type(d)(params[i]) if i < len(params) else d for i, d in enumerate(cls.defaults)))
+
+
+def columns(specs):
+    names = []
+    for spec in specs:
+        outputs = KINDS[spec.split(":")[0]].outputs
+        names.extend(spec if out == "" else f"{spec}.{out}" for out in outputs)
+    return names
+
+
+def uses_volume(spec):
+    return KINDS[spec.split(":")[0]].uses_volume
+
+
+def compute(candles, specs):
+    """
+    Vectorised indicator values for every candle: an (n, len(columns(specs)))
+    array, NaN while an indicator warms up.
+    """
+    if not specs:
+        return np.empty((len(candles), 0))
+    return np.hstack([create(spec).batch(candles) for spec in specs])
+
+
+class IndicatorSet:
+    """
+    The live indicators of one (ticker, timeframe) bar series, shared by
+    every subscriber that asked for any of them. Each indicator reports
+    nothing until it has been seeded from history.
+    """
+
+    def __init__(self):
+        self.users = {}  # callback -> set of specs it asked for
+        self.indicators = {}  # spec -> seeded Indicator, or None until then
+        self.columns = {}  # spec -> its column names
+
+    def add(self, callback, specs):
+        """
+        Returns the specs that are new to this series and need seeding.
+        """
+        self.users.setdefault(callback, set()).update(specs)
+        new = [s for s in specs if s not in self.indicators]
+        for spec in new:
+            self.indicators[spec] = None
+            self.columns[spec] = columns([spec])
+        return new
+
+    def remove(self, callback):
+        """
+        Drops callback's indicators nobody else uses; True once unused.
+        """
+        self.users.pop(callback, None)
+        wanted = set().union(*self.users.values())
+        for spec in [s for s in self.indicators if s not in wanted]:
+            del self.indicators[spec]
+            del self.columns[spec]
+        return not self.users
+
+    def seed(self, spec, candles):
+        if spec in self.indicators:
+            indicator = create(spec)
+            indicator.seed(candles)
+            self.indicators[spec] = indicator
+
+    def on_bar(self, row, closed):
+        """
+        {column: value} for a bar event; a closed bar is committed.
+        """
+        row = row.tolist()  # plain floats are faster one at a time
+        values = {}
+        for spec, indicator in self.indicators.items():
+            if indicator is None:
+                continue
+            result = indicator.push(row) if closed else indicator.peek(row)
+            values.update(zip(self.columns[spec], result))
+        return values
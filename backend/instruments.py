@@ -0,0 +1,134 @@
+import json
+import os
+import re
+
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instruments.json")
+
+# Longest prefix stored in the prefix indexes; longer queries use the
+# first MAX_PREFIX characters and are verified against the full text.
+MAX_PREFIX = 8
+
+# Match tiers, best first
+EXACT, SYMBOL_PREFIX, NAME_PREFIX, SUBSTRING = range(4)
+
+_WORD_SPLIT = re.compile(r"[^0-9A-Z]+")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class InstrumentRegistry:
+    """
+    Searchable universe of instruments, built once and queried on every
+    keystroke.
+
+    Instruments keep their insertion order as popularity: the bundled file
+    is ordered by market cap and exchange markets are appended after it.
+    Within a match tier, earlier instruments rank first.
+    """
+
+    def __init__(self):
+        self.instruments = []
+        self.by_symbol = {}
+        self.exact = {}  # symbol or crypto base -> ids
+        self.symbol_prefix = {}  # prefix -> ids
+        self.name_prefix = {}  # prefix of any name word -> ids
+        self.trigrams = {}  # trigram -> set of ids
+
+    def load_file(self, path=BUNDLED_PATH):
+        with open(path, encoding="utf-8") as f:
+            for item in json.load(f):
+                self.add(item["symbol"], item["name"], item["type"])
+
+    def add_markets(self, markets):
+        """
+        Adds active spot USDT pairs from ccxt's load_markets() result.
+        """
+        added = 0
+        for market in markets.values():
+            if not market.get("active", True) or not market.get("spot") or market.get("quote") != "USDT":
+                continue
+            if self.add(market["symbol"], market.get("base") or market["symbol"], "Crypto"):
+                added += 1
+        return added
+
+    def add(self, symbol, name, type):
+        symbol = symbol.upper()
+        if symbol in self.by_symbol:
+            return False
+
+        idx = len(self.instruments)
+        item = {"symbol": symbol, "name": name, "type": type}
+        self.instruments.append(item)
+        self.by_symbol[symbol] = idx
+
+        name_upper = name.upper()
+        item["_name"] = name_upper
+
+        keys = {symbol}
+        if "/" in symbol:
+            keys.add(symbol.split("/")[0])
+        for key in keys:
+            self.exact.setdefault(key, []).append(idx)
+
+        for i in range(1, min(len(symbol), MAX_PREFIX) + 1):
+            self.symbol_prefix.setdefault(symbol[:i], []).append(idx)
+
+        prefixes = set()
+        for word in [name_upper] + _WORD_SPLIT.split(name_upper):
+            prefixes.update(word[:i] for i in range(1, min(len(word), MAX_PREFIX) + 1))
+        for prefix in prefixes:
+            self.name_prefix.setdefault(prefix, []).append(idx)
+
+        for gram in _trigrams(symbol) | _trigrams(name_upper):
+            self.trigrams.setdefault(gram, set()).add(idx)
+        return True
+
+    def search(self, query, limit=10):
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        found = []
+        seen = set()
+
+        def take(ids, matches):
+            for idx in ids:
+                if len(found) >= limit:
+                    return
+                if idx not in seen and matches(self.instruments[idx]):
+                    seen.add(idx)
+                    found.append(idx)
+
+        always = lambda item: True
+        short = query[:MAX_PREFIX]
+        long_query = len(query) > MAX_PREFIX
+
+        take(self.exact.get(query, ()), always)
+        take(
+            self.symbol_prefix.get(short, ()),
+            (lambda item: item["symbol"].startswith(query)) if long_query else always,
+        )
+        take(
+            self.name_prefix.get(short, ()),
+            (lambda item: query in item["_name"]) if long_query else always,
+        )
+
+        if len(found) < limit and len(query) >= 3:
+            # Substring match: intersect the posting sets of every trigram,
+            # smallest first, then verify the survivors.
+            sets = sorted((self.trigrams.get(g, set()) for g in _trigrams(query)), key=len)
+            candidates = set.intersection(*sets) if sets and sets[0] else set()
+            take(
+                sorted(candidates),
+                lambda item: query in item["symbol"] or query in item["_name"],
+            )
+
+        return [self._public(self.instruments[idx]) for idx in found]
+
+    def _public(self, item):
+        return {"symbol": item["symbol"], "name": item["name"], "type": item["type"]}
+
+    def __len__(self):
+        return len(self.instruments)
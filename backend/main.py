@@ -1,11 +1,53 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 import asyncio
-import json
 from market_data import MarketDataService
+from hub import SubscriptionHub
+from feed import FEED_SOCKET, FeedClient, FeedError
+from ws_session import ClientSession, sessions_stats
+from history_format import history_response, UnsupportedFormat
+from downsampling import ALGORITHMS
+from indicators import InvalidIndicator, columns as indicator_columns, parse_indicators
+import metrics
+from metrics import MetricsMiddleware, record_error
+import ws_session
+import tick_codec
 
-app = FastAPI()
+# Largest watchlist a single /quotes call may ask for
+MAX_QUOTES = 200
 
+if FEED_SOCKET:
+    # Running as one of several workers (see serve.py): ticks, history,
+    # quotes and search all come from the shared feed process, which owns
+    # the only upstream clients.
+    feed_client = market_service = FeedClient(FEED_SOCKET)
+else:
+    feed_client = None
+    market_service = MarketDataService()
+    market_service.register_metrics()
+hub = SubscriptionHub(market_service, history=market_service)
+
+@asynccontextmanager
+async def lifespan(app):
+    background = [asyncio.create_task(metrics.watch_event_loop())]
+    if not feed_client:
+        # Search works off the bundled list right away; exchange markets are
+        # merged in the background so startup isn't blocked on Binance.
+        background.append(asyncio.create_task(market_service.load_instruments()))
+    yield
+    # Stop polling before the upstream clients go away, then close their
+    # HTTP sessions and the stock worker pool (or the feed connection).
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await hub.close()
+    await market_service.close()
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For dev, allow all
@@ -14,37 +56,153 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-market_service = MarketDataService()
+@app.exception_handler(FeedError)
+async def feed_unavailable(request: Request, e: FeedError):
+    # Workers can't serve history, quotes or search while the feed process
+    # is down or restarting; tell clients to retry instead of a bare 500
+    record_error("feed", e)
+    return JSONResponse({"detail": f"market data feed unavailable: {e}"}, status_code=503)
+
+metrics.Collected(
+    "baku_ws_connections", "Open WebSocket connections", ("endpoint",),
+    lambda: {
+        ("/ws",): sum(1 for s in ws_session.active_sessions if s.batched),
+        ("/ws/{ticker}",): sum(1 for s in ws_session.active_sessions if not s.batched),
+    },
+)
+metrics.Collected(
+    "baku_ticker_subscribers", "Subscribers per streamed ticker", ("ticker",),
+    lambda: {(symbol,): len(callbacks) for symbol, callbacks in hub.subscribers.items()},
+)
 
 @app.get("/")
 async def root():
     return {"status": "ok", "service": "Finance API"}
 
+@app.get("/metrics")
+async def get_metrics():
+    text = metrics.render()
+    if feed_client:
+        # Upstream calls happen in the feed process; report them too
+        try:
+            text = metrics.merge(text, metrics.relabel(await feed_client.metrics(), "process", "feed"))
+        except FeedError as e:
+            record_error("metrics.feed", e)
+    return Response(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def stats():
+    try:
+        service_stats = await market_service.stats()
+    except FeedError as e:
+        # This worker's own counters are still worth reporting
+        record_error("stats.feed", e)
+        service_stats = {"feed": {"error": str(e)}}
+    return {
+        "hub": hub.stats(),
+        "websockets": sessions_stats(),
+        **service_stats,
+    }
+
+async def cancel_on_disconnect(request: Request, coro):
+    """
+    Runs coro, cancelling it if the client disconnects first so that
+    queued upstream work for an abandoned request is dropped.
+    """
+    task = asyncio.create_task(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.5)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            return None
+
 @app.get("/history/{ticker:path}")
-async def get_history(ticker: str, period: str = "1d", interval: str = "1m"):
+async def get_history(request: Request, ticker: str, period: str = "1d", interval: str = "1m", format: str = "rows",
+                      max_points: int | None = None, downsample: str = "lttb", indicators: str = ""):
+    """
+    format=rows (default) keeps the legacy [{"time", "value"}] shape,
+    format=columns returns full OHLCV columns. Accept: application/msgpack
+    or application/vnd.apache.arrow.stream selects a binary columnar body.
+    max_points caps the number of bars, using the lttb or minmax algorithm.
+    indicators=sma:20,rsi:14,bb:20:2 adds indicator values to every bar.
+    """
     ticker = ticker.upper()
-    data = await market_service.get_history(ticker, period, interval)
-    return data
+    if downsample not in ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"downsample must be one of {', '.join(ALGORITHMS)}")
+    if max_points is not None and max_points < 3:
+        raise HTTPException(status_code=400, detail="max_points must be at least 3")
+    try:
+        specs = parse_indicators(indicators)
+    except InvalidIndicator as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if specs:
+        load = market_service.get_history_with_indicators(ticker, period, interval, specs, max_points, downsample)
+    else:
+        load = market_service.get_history(ticker, period, interval, max_points, downsample)
+    result = await cancel_on_disconnect(request, load)
+    if result is None:
+        return Response(status_code=499)
+
+    extra = None
+    if specs:
+        result, values = result
+        extra = (indicator_columns(specs), values)
+    try:
+        return history_response(result, format, request.headers.get("accept"), extra)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@app.get("/quotes")
+async def get_quotes(tickers: str):
+    """
+    Comma-separated tickers, e.g. /quotes?tickers=BTC/USDT,ETH/USDT,AAPL
+    """
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    if len(symbols) > MAX_QUOTES:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_QUOTES} tickers per request")
+    return await market_service.get_quotes(symbols)
 
 @app.get("/search")
 async def search_assets(q: str):
     return await market_service.search_assets(q)
 
+async def accept(websocket):
+    """
+    Accepts the connection, picking the binary tick protocol if the client
+    offers it. Returns True for binary.
+    """
+    binary = tick_codec.PROTOCOL in websocket.scope.get("subprotocols", ())
+    await websocket.accept(subprotocol=tick_codec.PROTOCOL if binary else None)
+    return binary
+
+@app.websocket("/ws")
+async def multiplexed_websocket(websocket: WebSocket):
+    binary = await accept(websocket)
+    session = ClientSession(websocket, hub, binary=binary)
+    try:
+        await session.run()
+    except Exception as e:
+        record_error("websocket", e)
+        print(f"Error in websocket: {e}")
+        await websocket.close()
+
 @app.websocket("/ws/{ticker:path}")
 async def websocket_endpoint(websocket: WebSocket, ticker: str):
-    await websocket.accept()
+    binary = await accept(websocket)
+    # Ensure ticker is upper case
+    ticker = ticker.upper()
+
+    # Same conflating session as /ws, but updates go out one by one
+    session = ClientSession(websocket, hub, batched=False, binary=binary)
+    session.subscribe(ticker)
     try:
-        # Subscribe logic would go here. 
-        # For this demo, we'll stream data for the requested ticker.
-        # Ensure ticker is upper case
-        ticker = ticker.upper()
-        
-        async for data in market_service.stream_ticker(ticker):
-            await websocket.send_json(data)
-            
-    except WebSocketDisconnect:
+        await session.run()
         print(f"Client disconnected from {ticker}")
     except Exception as e:
+        record_error("websocket", e)
         print(f"Error in websocket: {e}")
         await websocket.close()
 
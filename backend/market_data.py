@@ -1,42 +1,146 @@
 import asyncio
-import ccxt.async_support as ccxt
-import yfinance as yf
+import os
 import pandas as pd
 import random
 import datetime
+import numpy as np
+from stock_provider import StockProvider
+from providers import RATE_LIMITS, create_providers, is_transient
+from upstream import Upstream
+import metrics
+from metrics import UPSTREAM_SECONDS, record_error, timed
+from history_cache import HistoryCache, ttl_for_interval
+from candle_store import CandleStore, EMPTY as EMPTY_CANDLES
+from downsampling import downsample
+import indicators
+from instruments import InstrumentRegistry
+
+# Candles per fetch_ohlcv call; Binance caps it at 1000.
+OHLCV_PAGE = 1000
+# Smallest and largest number of crypto candles a history request serves.
+DEFAULT_BARS = 1000
+MAX_BARS = 100000
+# fetch_ohlcv pages one history request may make per direction; longer
+# gaps are filled in over several requests.
+MAX_SYNC_PAGES = 10
+
+# Bar intervals yfinance accepts; anything else never reaches the store
+STOCK_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo")
+
+PERIOD_DAYS = {
+    "1h": 1 / 24, "1d": 1, "5d": 5, "1mo": 30, "3mo": 91, "6mo": 182,
+    "1y": 365, "2y": 730, "5y": 1826, "10y": 3652,
+}
+
+
+def period_span_ms(period, now_ms):
+    """
+    Length of a yfinance-style period in ms, or None for 'max'/unknown.
+    """
+    if period == "ytd":
+        now = datetime.datetime.fromtimestamp(now_ms / 1000, tz=datetime.timezone.utc)
+        jan1 = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        return now_ms - int(jan1.timestamp() * 1000)
+    days = PERIOD_DAYS.get(period)
+    return None if days is None else int(days * 86400 * 1000)
+
+
+def history_to_rows(hist):
+    """
+    yfinance history DataFrame -> [timestamp_ms, open, high, low, close, volume] rows.
+    """
+    if hist is None or hist.empty:
+        return EMPTY_CANDLES
+    rows = np.empty((len(hist), 6))
+    rows[:, 0] = hist.index.as_unit("ms").asi8
+    rows[:, 1:] = hist[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype=np.float64)
+    return rows
+
+
+def normalize_ticker(ticker):
+    """
+    Returns (symbol, is_crypto) for a streamed ticker, so that 'BTC' and
+    'BTC/USDT' resolve to the same upstream symbol.
+    """
+    # Determine if crypto or stock
+    is_crypto = '/' in ticker or ticker.endswith('USDT') or ticker in ['BTC', 'ETH']
+
+    # Normalize crypto ticker for CCXT
+    if is_crypto and '/' not in ticker:
+        if ticker in ['BTC', 'ETH', 'SOL', 'DOGE']:
+            ticker = f"{ticker}/USDT"
+
+    return ticker, is_crypto
+
+
+# Seconds between upstream polls of a streamed ticker
+TICK_INTERVAL = float(os.getenv("BAKU_TICK_INTERVAL", "1"))
+# Longest a stream waits before polling again after failed ticks
+MAX_TICK_BACKOFF = 30
 
 class MarketDataService:
-    def __init__(self):
-        self.exchange = ccxt.binance()
+    def __init__(self, provider=None):
+        """
+        provider: "live" (Binance + yfinance) or "simulated"; defaults to
+        the BAKU_PROVIDER environment variable.
+        """
+        self.exchange, stock_source = create_providers(provider)
+        self.exchange_name = getattr(self.exchange, "id", type(self.exchange).__name__)
+        self.crypto_upstream = self._upstream(self.exchange_name)
+        self.stocks = StockProvider(
+            stock_source, name=stock_source.name,
+            # History frames can be large, keep fewer of them around
+            upstream=self._upstream(stock_source.name, fallback_size=256),
+        )
+        self.history_cache = HistoryCache()
+        self.candle_store = CandleStore()
+        self.store_locks = {}
+        self.instruments = InstrumentRegistry()
+        self.instruments.load_file()
         
+    def _upstream(self, name, **kwargs):
+        rate, burst = RATE_LIMITS.get(name, (None, None))
+        return Upstream(name, rate=rate, burst=burst, is_transient=is_transient, **kwargs)
+
+    async def _call_exchange(self, method, *args, **kwargs):
+        # Every exchange request goes through here so it is rate limited,
+        # retried and timed per call
+        return await self.crypto_upstream.call(method, self._timed_exchange_call, method, *args, **kwargs)
+
+    async def _timed_exchange_call(self, method, *args, **kwargs):
+        with timed(UPSTREAM_SECONDS.labels(self.exchange_name, method)):
+            return await getattr(self.exchange, method)(*args, **kwargs)
+
     async def get_crypto_price(self, symbol):
         # symbol e.g., 'BTC/USDT'
         try:
-            ticker = await self.exchange.fetch_ticker(symbol)
+            # A stale tick would be re-broadcast as live; fail instead so the
+            # stream backs off
+            ticker = await self._call_exchange("fetch_ticker", symbol, stale_ok=False)
             return {
                 "ticker": symbol,
                 "price": ticker['last'],
                 "change": ticker['percentage'],
                 "volume": ticker['quoteVolume'],
+                # Same unit as candle volume, for live bars
+                "base_volume": ticker.get('baseVolume'),
                 "timestamp": ticker['timestamp'],
                 "type": "crypto"
             }
         except Exception as e:
+            record_error("crypto_price", e)
             print(f"Error fetching crypto {symbol}: {e}")
             return None
 
     async def get_stock_price(self, symbol):
         # symbol e.g., 'AAPL'
-        # yfinance is synchronous, run in executor if needed for high throughput, 
-        # but for this demo standard call is okay-ish or better simulated for real-time appearance
+        # yfinance is synchronous, so the call runs on the stock provider's worker pool.
         # Real-time stock data is hard to get for free. We will simulate "live" ticks 
         # based on the last close + random noise for the demo if market is closed,
         # or just fetch latest if open (delayed).
         try:
-            ticker = yf.Ticker(symbol)
             # fast_info is faster access
-            price = ticker.fast_info['last_price']
-            prev_close = ticker.fast_info['previous_close']
+            price, prev_close = await self.stocks.fast_info(symbol)
             change = ((price - prev_close) / prev_close) * 100
             
             return {
@@ -47,20 +151,104 @@ class MarketDataService:
                 "type": "stock"
             }
         except Exception as e:
+            record_error("stock_price", e)
             print(f"Error fetching stock {symbol}: {e}")
             return None
 
+    async def get_quotes(self, tickers):
+        """
+        Quotes for many tickers with one upstream call per asset class:
+        a single fetch_tickers for crypto and one batched yfinance download
+        for stocks. Tickers that can't be quoted are left out.
+        """
+        crypto, stocks = [], []
+        for ticker in tickers:
+            symbol, is_crypto = self.normalize_ticker(ticker)
+            group = crypto if is_crypto else stocks
+            if symbol not in group:
+                group.append(symbol)
+
+        results = await asyncio.gather(
+            self._get_crypto_quotes(crypto),
+            self._get_stock_quotes(stocks),
+        )
+        quotes = {**results[0], **results[1]}
+        return [quotes[s] for s in crypto + stocks if s in quotes]
+
+    async def _get_crypto_quotes(self, symbols):
+        if not symbols:
+            return {}
+        try:
+            symbols = await self._listed_symbols(symbols)
+            if not symbols:
+                return {}
+            tickers = await self._call_exchange("fetch_tickers", symbols)
+        except Exception as e:
+            record_error("crypto_quotes", e)
+            print(f"Error fetching crypto quotes: {e}")
+            return {}
+        return {
+            symbol: {
+                "ticker": symbol,
+                "price": ticker['last'],
+                "change": ticker['percentage'],
+                "volume": ticker['quoteVolume'],
+                "timestamp": ticker['timestamp'],
+                "type": "crypto"
+            }
+            for symbol, ticker in tickers.items()
+        }
+
+    async def _listed_symbols(self, symbols):
+        """
+        The symbols the exchange lists. ccxt rejects a whole fetch_tickers
+        call with BadSymbol over a single unknown one, so they are dropped
+        up front. Providers without a ccxt-style markets table are trusted.
+        """
+        if not hasattr(self.exchange, "markets"):
+            return symbols
+        if self.exchange.markets is None:
+            await self._call_exchange("load_markets")
+        return [s for s in symbols if s in self.exchange.markets]
+
+    async def _get_stock_quotes(self, symbols):
+        if not symbols:
+            return {}
+        try:
+            closes = await self.stocks.daily_closes(symbols)
+        except Exception as e:
+            record_error("stock_quotes", e)
+            print(f"Error fetching stock quotes: {e}")
+            return {}
+
+        timestamp = int(datetime.datetime.now().timestamp() * 1000)
+        quotes = {}
+        for symbol in symbols:
+            if symbol not in closes:
+                continue
+            series = closes[symbol].dropna()
+            if series.empty:
+                continue
+            price = float(series.iloc[-1])
+            prev_close = float(series.iloc[-2]) if len(series) > 1 else price
+            quotes[symbol] = {
+                "ticker": symbol,
+                "price": price,
+                "change": ((price - prev_close) / prev_close) * 100 if prev_close else 0.0,
+                "timestamp": timestamp,
+                "type": "stock"
+            }
+        return quotes
+
+    def normalize_ticker(self, ticker):
+        return normalize_ticker(ticker)
+
     async def stream_ticker(self, ticker):
         """
         Generator that yields real-time data.
         """
-        # Determine if crypto or stock
-        is_crypto = '/' in ticker or ticker.endswith('USDT') or ticker in ['BTC', 'ETH']
-        
-        # Normalize crypto ticker for CCXT
-        if is_crypto and '/' not in ticker:
-            if ticker in ['BTC', 'ETH', 'SOL', 'DOGE']:
-                ticker = f"{ticker}/USDT"
+        ticker, is_crypto = self.normalize_ticker(ticker)
+        delay = TICK_INTERVAL
         
         while True:
             if is_crypto:
@@ -70,296 +258,253 @@ class MarketDataService:
             
             if data:
                 yield data
+                # Update frequency: 1 second by default
+                delay = TICK_INTERVAL
+                await asyncio.sleep(delay)
+            else:
+                # Upstream is struggling, poll it less often until it
+                # recovers; jittered so streams don't retry in lockstep
+                delay = min(delay * 2, MAX_TICK_BACKOFF)
+                await asyncio.sleep(delay * random.uniform(0.5, 1))
             
-            # Update frequency: 1 second
-            await asyncio.sleep(1)
-            
-    async def get_history(self, ticker, period="1d", interval="1m"):
+    async def get_history(self, ticker, period="1d", interval="1m", max_points=None, algorithm="lttb"):
         """
         Fetch historical data.
         period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max
         interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
+
+        Returns an (n, 6) array of [timestamp_ms, open, high, low, close, volume]
+        rows, served from the history cache; concurrent misses share one fetch.
+        With max_points set the window is downsampled (see downsampling.py)
+        and each resolution is cached on its own.
         """
+        ttl = ttl_for_interval(interval)
+        key = (ticker, period, interval)
+        if max_points:
+            full = lambda: self.get_history(ticker, period, interval)
+            return await self.history_cache.get(
+                key + (max_points, algorithm),
+                ttl,
+                lambda: self._downsample(full, max_points, algorithm),
+            )
+        return await self.history_cache.get(
+            key,
+            ttl,
+            lambda: self._fetch_history(ticker, period, interval),
+        )
+
+    async def get_history_with_indicators(self, ticker, period, interval, specs, max_points=None, algorithm="lttb"):
+        """
+        (candles, values): the candles get_history() returns for the same
+        arguments plus one row of indicator columns (see
+        indicators.columns) per candle. Indicators are computed over the
+        full-resolution window and downsampled together with the candles,
+        so thinning a line never changes its values.
+        """
+        combined = await self.history_cache.get(
+            ("indicators", ticker, period, interval, tuple(specs), max_points, algorithm),
+            ttl_for_interval(interval),
+            lambda: self._compute_indicators(ticker, period, interval, specs, max_points, algorithm),
+        )
+        return combined[:, :6], combined[:, 6:]
+
+    async def _compute_indicators(self, ticker, period, interval, specs, max_points, algorithm):
+        full = await self.get_history(ticker, period, interval)
+        combined = np.hstack([full, indicators.compute(full, specs)])
+        return downsample(combined, max_points, algorithm)
+
+    async def _downsample(self, load, max_points, algorithm):
+        return downsample(await load(), max_points, algorithm)
+
+    async def _fetch_history(self, ticker, period, interval):
         is_crypto = '/' in ticker or ticker.endswith('USDT') 
         
         # Normalize
         if is_crypto and '/' not in ticker:
              ticker = f"{ticker}/USDT"
 
-        data_points = []
-        
         try:
             if is_crypto:
-                # CCXT mapping for periods roughly
-                # period logic is complex for ccxt, usually specific candles count
-                # simpler to use a default or map period to limit
                 timeframe = interval if interval in self.exchange.timeframes else '1m'
-                # fetch last 1000 candles
-                ohlcv = await self.exchange.fetch_ohlcv(ticker, timeframe, limit=1000)
-                # Format: [timestamp, open, high, low, close, volume]
-                for x in ohlcv:
-                     data_points.append({
-                         "time": x[0] / 1000, # seconds
-                         "value": x[4] # close price
-                     })
+                async with self._store_lock(ticker, timeframe):
+                    start_ms = await self._sync_crypto_history(ticker, timeframe, period)
             else:
                 # Stocks (yfinance)
-                # Map timeframe to yfinance arguments
                 # yf period: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
-                # yf interval: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo
-                
-                # Handling '1W' etc from frontend if passed differently
-                stock = yf.Ticker(ticker)
-                hist = stock.history(period=period, interval=interval)
-                
-                # hist.index is Timestamp
-                for index, row in hist.iterrows():
-                    data_points.append({
-                        "time": index.timestamp(),
-                        "value": row['Close']
-                    })
-                    
-            return data_points
+                if interval not in STOCK_INTERVALS:
+                    raise ValueError(f"Unsupported interval {interval!r}")
+                timeframe = interval
+                async with self._store_lock(ticker, timeframe):
+                    start_ms = await self._sync_stock_history(ticker, timeframe, period)
+
+            # Format: [timestamp, open, high, low, close, volume]
+            return self.candle_store.window(ticker, timeframe, start_ms)
         except Exception as e:
+            record_error("history", e)
             print(f"Error fetching history for {ticker}: {e}")
-            return []
+            return EMPTY_CANDLES
+
+    def _store_lock(self, ticker, timeframe):
+        # Serializes syncs of one series so concurrent requests for different
+        # periods don't write the same file at once.
+        return self.store_locks.setdefault((ticker, timeframe), asyncio.Lock())
+
+    async def _sync_crypto_history(self, symbol, timeframe, period):
+        """
+        Brings the stored candles for symbol up to date and returns the
+        start (ms) of the window to serve. Only candles after the last stored
+        one are downloaded, plus a one-off backfill when the window reaches
+        further back than anything fetched before.
+        """
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        now_ms = self.exchange.milliseconds()
+
+        # Always serve at least the DEFAULT_BARS the endpoint used to return,
+        # and never more than MAX_BARS.
+        span_ms = period_span_ms(period, now_ms)
+        if span_ms is None:
+            span_ms = MAX_BARS * tf_ms
+        span_ms = min(max(span_ms, DEFAULT_BARS * tf_ms), MAX_BARS * tf_ms)
+        # Nothing trades before 1970; Binance answers a since before the
+        # listing date with the first candles after it
+        start_ms = max(now_ms - span_ms, 0)
+
+        budget_ms = MAX_SYNC_PAGES * OHLCV_PAGE * tf_ms
+
+        stored = self.candle_store.read(symbol, timeframe)
+        covered_from = self.candle_store.covered_from(symbol, timeframe)
+        if len(stored) and now_ms - stored[-1, 0] > budget_ms:
+            # Idle for longer than one request can catch up on: creeping
+            # forward from the old tail would leave the window empty for
+            # several requests, so start the series over from the window
+            stored = EMPTY_CANDLES
+
+        if not len(stored) or covered_from is None or covered_from > start_ms:
+            # Backfill everything between start_ms and the first candle we
+            # have, at most MAX_SYNC_PAGES of it; the next request goes on
+            # from there
+            stop_ms = stored[0, 0] if len(stored) else now_ms
+            start_ms = max(start_ms, stop_ms - budget_ms)
+            older = await self._fetch_ohlcv_pages(symbol, timeframe, start_ms, stop_ms)
+            if not len(stored):
+                # Nothing on disk for an unknown or unlisted symbol; don't
+                # leave empty files behind. Replacing also drops an old
+                # series together with the hole after it.
+                if len(older):
+                    self.candle_store.replace(symbol, timeframe, older, covered_from=start_ms)
+                # The backfill already ran up to now
+                return start_ms
+            rows = np.concatenate([older, stored]) if len(older) else np.array(stored)
+            self.candle_store.replace(symbol, timeframe, rows, covered_from=start_ms)
+
+        # Re-fetch from the last stored candle, it was probably still open
+        last_ms = self.candle_store.last_timestamp(symbol, timeframe)
+        if last_ms is not None:
+            newer = await self._fetch_ohlcv_pages(symbol, timeframe, last_ms, now_ms + tf_ms)
+            self.candle_store.merge(symbol, timeframe, newer)
+
+        return start_ms
+
+    async def _fetch_ohlcv_pages(self, symbol, timeframe, since_ms, stop_ms):
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        pages = []
+        since = int(since_ms)
+        for _ in range(MAX_SYNC_PAGES):
+            ohlcv = await self._call_exchange("fetch_ohlcv", symbol, timeframe, since=since, limit=OHLCV_PAGE)
+            if not ohlcv:
+                break
+            pages.append(np.asarray(ohlcv, dtype=np.float64))
+            last = ohlcv[-1][0]
+            if len(ohlcv) < OHLCV_PAGE or last >= stop_ms:
+                break
+            since = int(last + tf_ms)
+
+        if not pages:
+            return EMPTY_CANDLES
+        rows = np.concatenate(pages)
+        return rows[rows[:, 0] < stop_ms]
+
+    async def _sync_stock_history(self, symbol, interval, period):
+        """
+        Stock counterpart of _sync_crypto_history. Trading hours leave gaps,
+        so the window is anchored on the latest stored bar rather than on
+        the current time.
+        """
+        now_ms = int(datetime.datetime.now().timestamp() * 1000)
+        span_ms = period_span_ms(period, now_ms)
+        wanted_from = 0 if span_ms is None else now_ms - span_ms
+
+        covered_from = self.candle_store.covered_from(symbol, interval)
+        last_ms = self.candle_store.last_timestamp(symbol, interval)
+
+        hist = None
+        if last_ms is not None and covered_from is not None and covered_from <= wanted_from:
+            try:
+                start = datetime.datetime.fromtimestamp(last_ms / 1000, tz=datetime.timezone.utc)
+                hist = await self.stocks.history(symbol, interval=interval, start=start)
+                self.candle_store.merge(symbol, interval, history_to_rows(hist))
+            except Exception as e:
+                # e.g. intraday bars older than yfinance keeps; refetch the period
+                record_error("stock_history_incremental", e)
+                print(f"Incremental history for {symbol} failed, refetching: {e}")
+                hist = None
+
+        if hist is None:
+            hist = await self.stocks.history(symbol, period=period, interval=interval)
+            rows = history_to_rows(hist)
+            if len(rows):
+                stored = self.candle_store.read(symbol, interval)
+                if len(stored):
+                    rows = np.concatenate([stored, rows])
+                self.candle_store.replace(symbol, interval, rows, covered_from=wanted_from)
+
+        last_ms = self.candle_store.last_timestamp(symbol, interval)
+        if last_ms is None or span_ms is None:
+            return None
+        return last_ms - span_ms
+
+    async def load_instruments(self):
+        """
+        Enriches the instrument registry with the exchange's markets.
+        The bundled list is already searchable, so failures here only cost
+        coverage.
+        """
+        try:
+            markets = await self._call_exchange("load_markets")
+            added = self.instruments.add_markets(markets)
+            print(f"Instrument registry: {added} exchange markets added, {len(self.instruments)} total")
+        except Exception as e:
+            record_error("load_markets", e)
+            print(f"Error loading exchange markets: {e}")
 
     async def search_assets(self, query):
         """
-        Simple autocomplete mock. In prod, use a real database or API.
+        Ranked autocomplete over the instrument registry: exact symbol,
+        then symbol prefix, then name prefix, then substring matches.
         """
-        query = query.upper()
-        # Mix of popular stocks and crypto
-        assets = [
-            {"symbol": "BTC/USDT", "name": "Bitcoin", "type": "Crypto"},
-            {"symbol": "ETH/USDT", "name": "Ethereum", "type": "Crypto"},
-            {"symbol": "USDT/USDT", "name": "Tether", "type": "Crypto"},
-            {"symbol": "XRP/USDT", "name": "XRP", "type": "Crypto"},
-            {"symbol": "BNB/USDT", "name": "BNB", "type": "Crypto"},
-            {"symbol": "SOL/USDT", "name": "Solana", "type": "Crypto"},
-            {"symbol": "USDC/USDT", "name": "USDC", "type": "Crypto"},
-            {"symbol": "STETH/USDT", "name": "Lido Staked Ether", "type": "Crypto"},
-            {"symbol": "TRX/USDT", "name": "TRON", "type": "Crypto"},
-            {"symbol": "DOGE/USDT", "name": "Dogecoin", "type": "Crypto"},
-            {"symbol": "ADA/USDT", "name": "Cardano", "type": "Crypto"},
-            {"symbol": "WSTETH/USDT", "name": "Wrapped stETH", "type": "Crypto"},
-            {"symbol": "BCH/USDT", "name": "Bitcoin Cash", "type": "Crypto"},
-            {"symbol": "WBETH/USDT", "name": "Wrapped Beacon ETH", "type": "Crypto"},
-            {"symbol": "WBTC/USDT", "name": "Wrapped Bitcoin", "type": "Crypto"},
-            {"symbol": "WEETH/USDT", "name": "Wrapped eETH", "type": "Crypto"},
-            {"symbol": "USDS/USDT", "name": "USDS", "type": "Crypto"},
-            {"symbol": "LINK/USDT", "name": "Chainlink", "type": "Crypto"},
-            {"symbol": "BSC-USD/USDT", "name": "Binance Bridged USDT", "type": "Crypto"},
-            {"symbol": "LEO/USDT", "name": "LEO Token", "type": "Crypto"},
-            {"symbol": "WETH/USDT", "name": "WETH", "type": "Crypto"},
-            {"symbol": "XMR/USDT", "name": "Monero", "type": "Crypto"},
-            {"symbol": "ZEC/USDT", "name": "Zcash", "type": "Crypto"},
-            {"symbol": "XLM/USDT", "name": "Stellar", "type": "Crypto"},
-            {"symbol": "SUI/USDT", "name": "Sui", "type": "Crypto"},
-            {"symbol": "CBBTC/USDT", "name": "Coinbase Wrapped BTC", "type": "Crypto"},
-            {"symbol": "HYPE/USDT", "name": "Hyperliquid", "type": "Crypto"},
-            {"symbol": "LTC/USDT", "name": "Litecoin", "type": "Crypto"},
-            {"symbol": "USDE/USDT", "name": "Ethena USDe", "type": "Crypto"},
-            {"symbol": "AVAX/USDT", "name": "Avalanche", "type": "Crypto"},
-            {"symbol": "NVDA", "name": "Nvidia Corp", "type": "Stock"},
-            {"symbol": "GOOGL", "name": "Alphabet Inc.", "type": "Stock"},
-            {"symbol": "AAPL", "name": "Apple Inc.", "type": "Stock"},
-            {"symbol": "MSFT", "name": "Microsoft Corp", "type": "Stock"},
-            {"symbol": "AMZN", "name": "Amazon.com Inc", "type": "Stock"},
-            {"symbol": "TSM", "name": "Taiwan Semiconductor", "type": "Stock"},
-            {"symbol": "META", "name": "Meta Platforms Inc", "type": "Stock"},
-            {"symbol": "AVGO", "name": "Broadcom Inc", "type": "Stock"},
-            {"symbol": "2222.SR", "name": "Saudi Aramco", "type": "Stock"},
-            {"symbol": "TSLA", "name": "Tesla Inc.", "type": "Stock"},
-            {"symbol": "BRK.B", "name": "Berkshire Hathaway Inc", "type": "Stock"},
-            {"symbol": "LLY", "name": "Eli Lilly and Co", "type": "Stock"},
-            {"symbol": "JPM", "name": "JPMorgan Chase & Co", "type": "Stock"},
-            {"symbol": "WMT", "name": "Walmart Inc", "type": "Stock"},
-            {"symbol": "TCEHY", "name": "Tencent Holdings", "type": "Stock"},
-            {"symbol": "V", "name": "Visa Inc", "type": "Stock"},
-            {"symbol": "005930.KS", "name": "Samsung Electronics", "type": "Stock"},
-            {"symbol": "ORCL", "name": "Oracle Corp", "type": "Stock"},
-            {"symbol": "MA", "name": "Mastercard Inc", "type": "Stock"},
-            {"symbol": "XOM", "name": "Exxon Mobil Corp", "type": "Stock"},
-            {"symbol": "JNJ", "name": "Johnson & Johnson", "type": "Stock"},
-            {"symbol": "ASML", "name": "ASML Holding NV", "type": "Stock"},
-            {"symbol": "PLTR", "name": "Palantir Technologies", "type": "Stock"},
-            {"symbol": "BAC", "name": "Bank of America Corp", "type": "Stock"},
-            {"symbol": "ABBV", "name": "AbbVie Inc", "type": "Stock"},
-            {"symbol": "COST", "name": "Costco Wholesale Corp", "type": "Stock"},
-            {"symbol": "NFLX", "name": "Netflix Inc", "type": "Stock"},
-            {"symbol": "MU", "name": "Micron Technology", "type": "Stock"},
-            {"symbol": "601288.SS", "name": "Agri Bank of China", "type": "Stock"},
-            {"symbol": "000660.KS", "name": "SK Hynix", "type": "Stock"},
-            {"symbol": "MC.PA", "name": "LVMH", "type": "Stock"},
-            {"symbol": "BABA", "name": "Alibaba Group", "type": "Stock"},
-            {"symbol": "1398.HK", "name": "ICBC", "type": "Stock"},
-            {"symbol": "HD", "name": "The Home Depot Inc", "type": "Stock"},
-            {"symbol": "GE", "name": "GE Aerospace", "type": "Stock"},
-            {"symbol": "AMD", "name": "Advanced Micro Devices", "type": "Stock"},
-            {"symbol": "ROG.SW", "name": "Roche Holding AG", "type": "Stock"},
-            {"symbol": "601939.SS", "name": "China Construction Bank", "type": "Stock"},
-            {"symbol": "PG", "name": "Procter & Gamble Co", "type": "Stock"},
-            {"symbol": "CVX", "name": "Chevron Corp", "type": "Stock"},
-            {"symbol": "UNH", "name": "UnitedHealth Group", "type": "Stock"},
-            {"symbol": "WFC", "name": "Wells Fargo & Co", "type": "Stock"},
-            {"symbol": "CSCO", "name": "Cisco Systems Inc", "type": "Stock"},
-            {"symbol": "AZN", "name": "AstraZeneca PLC", "type": "Stock"},
-            {"symbol": "MS", "name": "Morgan Stanley", "type": "Stock"},
-            {"symbol": "KO", "name": "The Coca-Cola Co", "type": "Stock"},
-            {"symbol": "GS", "name": "Goldman Sachs Group", "type": "Stock"},
-            {"symbol": "SAP", "name": "SAP SE", "type": "Stock"},
-            {"symbol": "CAT", "name": "Caterpillar Inc", "type": "Stock"},
-            {"symbol": "TM", "name": "Toyota Motor Corp", "type": "Stock"},
-            {"symbol": "PRX.AS", "name": "Prosus NV", "type": "Stock"},
-            {"symbol": "IBM", "name": "International Business Machines", "type": "Stock"},
-            {"symbol": "HSBC", "name": "HSBC Holdings PLC", "type": "Stock"},
-            {"symbol": "NVS", "name": "Novartis AG", "type": "Stock"},
-            {"symbol": "MRK", "name": "Merck & Co Inc", "type": "Stock"},
-            {"symbol": "AXP", "name": "American Express Co", "type": "Stock"},
-            {"symbol": "RMS.PA", "name": "Hermès International", "type": "Stock"},
-            {"symbol": "LRCX", "name": "Lam Research Corp", "type": "Stock"},
-            {"symbol": "601988.SS", "name": "Bank of China", "type": "Stock"},
-            {"symbol": "CRM", "name": "Salesforce Inc", "type": "Stock"},
-            {"symbol": "TMO", "name": "Thermo Fisher Scientific", "type": "Stock"},
-            {"symbol": "ABT", "name": "Abbott Laboratories", "type": "Stock"},
-            {"symbol": "LIN", "name": "Linde PLC", "type": "Stock"},
-            {"symbol": "PEP", "name": "PepsiCo Inc", "type": "Stock"},
-            {"symbol": "DIS", "name": "The Walt Disney Co", "type": "Stock"},
-            {"symbol": "QCOM", "name": "QUALCOMM Inc", "type": "Stock"},
-            {"symbol": "PM", "name": "Philip Morris International", "type": "Stock"},
-            {"symbol": "INTU", "name": "Intuit Inc", "type": "Stock"},
-            {"symbol": "TXN", "name": "Texas Instruments", "type": "Stock"},
-            {"symbol": "AMAT", "name": "Applied Materials Inc", "type": "Stock"},
-            {"symbol": "INTC", "name": "Intel Corp", "type": "Stock"},
-            {"symbol": "RTX", "name": "RTX Corp", "type": "Stock"},
-            {"symbol": "PFE", "name": "Pfizer Inc", "type": "Stock"},
-            {"symbol": "NEE", "name": "NextEra Energy", "type": "Stock"},
-            {"symbol": "DHR", "name": "Danaher Corp", "type": "Stock"},
-            {"symbol": "HON", "name": "Honeywell International", "type": "Stock"},
-            {"symbol": "UNP", "name": "Union Pacific Corp", "type": "Stock"},
-            {"symbol": "LOW", "name": "Lowe's Companies Inc", "type": "Stock"},
-            {"symbol": "SPGI", "name": "S&P Global Inc", "type": "Stock"},
-            {"symbol": "VRTX", "name": "Vertex Pharmaceuticals", "type": "Stock"},
-            {"symbol": "EL", "name": "Estée Lauder Companies", "type": "Stock"},
-            {"symbol": "CDNS", "name": "Cadence Design Systems", "type": "Stock"},
-            {"symbol": "SNPS", "name": "Synopsys Inc", "type": "Stock"},
-            {"symbol": "MDT", "name": "Medtronic PLC", "type": "Stock"},
-            {"symbol": "BX", "name": "Blackstone Inc", "type": "Stock"},
-            {"symbol": "DE", "name": "Deere & Co", "type": "Stock"},
-            {"symbol": "SHOP", "name": "Shopify Inc", "type": "Stock"},
-            {"symbol": "BKNG", "name": "Booking Holdings Inc", "type": "Stock"},
-            {"symbol": "ADP", "name": "Automatic Data Processing", "type": "Stock"},
-            {"symbol": "C", "name": "Citigroup Inc", "type": "Stock"},
-            {"symbol": "TJX", "name": "TJX Companies Inc", "type": "Stock"},
-            {"symbol": "MDLZ", "name": "Mondelez International", "type": "Stock"},
-            {"symbol": "LMT", "name": "Lockheed Martin Corp", "type": "Stock"},
-            {"symbol": "GILD", "name": "Gilead Sciences Inc", "type": "Stock"},
-            {"symbol": "CB", "name": "Chubb Limited", "type": "Stock"},
-            {"symbol": "PGR", "name": "Progressive Corp", "type": "Stock"},
-            {"symbol": "SYK", "name": "Stryker Corp", "type": "Stock"},
-            {"symbol": "ZTS", "name": "Zoetis Inc", "type": "Stock"},
-            {"symbol": "REGN", "name": "Regeneron Pharmaceuticals", "type": "Stock"},
-            {"symbol": "FI", "name": "Fiserv Inc", "type": "Stock"},
-            {"symbol": "SCHW", "name": "Charles Schwab Corp", "type": "Stock"},
-            {"symbol": "TMUS", "name": "T-Mobile US Inc", "type": "Stock"},
-            {"symbol": "T", "name": "AT&T Inc", "type": "Stock"},
-            {"symbol": "VZ", "name": "Verizon Communications", "type": "Stock"},
-            {"symbol": "BSX", "name": "Boston Scientific Corp", "type": "Stock"},
-            {"symbol": "CVS", "name": "CVS Health Corp", "type": "Stock"},
-            {"symbol": "BMY", "name": "Bristol-Myers Squibb", "type": "Stock"},
-            {"symbol": "AMGN", "name": "Amgen Inc", "type": "Stock"},
-            {"symbol": "CI", "name": "The Cigna Group", "type": "Stock"},
-            {"symbol": "UBER", "name": "Uber Technologies Inc", "type": "Stock"},
-            {"symbol": "MU", "name": "Micron Technology Inc", "type": "Stock"},
-            {"symbol": "PANW", "name": "Palo Alto Networks", "type": "Stock"},
-            {"symbol": "LRCX", "name": "Lam Research Corp", "type": "Stock"},
-            {"symbol": "ETN", "name": "Eaton Corp PLC", "type": "Stock"},
-            {"symbol": "SNOW", "name": "Snowflake Inc", "type": "Stock"},
-            {"symbol": "MCD", "name": "McDonald's Corp", "type": "Stock"},
-            {"symbol": "SBUX", "name": "Starbucks Corp", "type": "Stock"},
-            {"symbol": "ANET", "name": "Arista Networks Inc", "type": "Stock"},
-            {"symbol": "KLAC", "name": "KLA Corp", "type": "Stock"},
-            {"symbol": "ADBE", "name": "Adobe Inc", "type": "Stock"},
-            {"symbol": "PYPL", "name": "PayPal Holdings Inc", "type": "Stock"},
-            {"symbol": "SHW", "name": "Sherwin-Williams Co", "type": "Stock"},
-            {"symbol": "NKE", "name": "NIKE Inc", "type": "Stock"},
-            {"symbol": "ECL", "name": "Ecolab Inc", "type": "Stock"},
-            {"symbol": "EQIX", "name": "Equinix Inc", "type": "Stock"},
-            {"symbol": "PH", "name": "Parker-Hannifin Corp", "type": "Stock"},
-            {"symbol": "WM", "name": "Waste Management Inc", "type": "Stock"},
-            {"symbol": "ICE", "name": "Intercontinental Exchange", "type": "Stock"},
-            {"symbol": "MMC", "name": "Marsh & McLennan", "type": "Stock"},
-            {"symbol": "USB", "name": "U.S. Bancorp", "type": "Stock"},
-            {"symbol": "TGT", "name": "Target Corp", "type": "Stock"},
-            {"symbol": "ORLY", "name": "O'Reilly Automotive", "type": "Stock"},
-            {"symbol": "CMG", "name": "Chipotle Mexican Grill", "type": "Stock"},
-            {"symbol": "MCK", "name": "McKesson Corp", "type": "Stock"},
-            {"symbol": "MO", "name": "Altria Group Inc", "type": "Stock"},
-            {"symbol": "PNC", "name": "PNC Financial Services", "type": "Stock"},
-            {"symbol": "MPC", "name": "Marathon Petroleum", "type": "Stock"},
-            {"symbol": "EMR", "name": "Emerson Electric Co", "type": "Stock"},
-            {"symbol": "HCA", "name": "HCA Healthcare Inc", "type": "Stock"},
-            {"symbol": "COF", "name": "Capital One Financial", "type": "Stock"},
-            {"symbol": "NSC", "name": "Norfolk Southern Corp", "type": "Stock"},
-            {"symbol": "ROP", "name": "Roper Technologies", "type": "Stock"},
-            {"symbol": "AIG", "name": "American International Group", "type": "Stock"},
-            {"symbol": "EOG", "name": "EOG Resources Inc", "type": "Stock"},
-            {"symbol": "SLB", "name": "Schlumberger Limited", "type": "Stock"},
-            {"symbol": "ABNB", "name": "Airbnb Inc", "type": "Stock"},
-            {"symbol": "MAR", "name": "Marriott International", "type": "Stock"},
-            {"symbol": "PSX", "name": "Phillips 66", "type": "Stock"},
-            {"symbol": "KMB", "name": "Kimberly-Clark Corp", "type": "Stock"},
-            {"symbol": "MET", "name": "MetLife Inc", "type": "Stock"},
-            {"symbol": "AJG", "name": "Arthur J. Gallagher & Co", "type": "Stock"},
-            {"symbol": "FDX", "name": "FedEx Corp", "type": "Stock"},
-            {"symbol": "STZ", "name": "Constellation Brands", "type": "Stock"},
-            {"symbol": "MCO", "name": "Moody's Corp", "type": "Stock"},
-            {"symbol": "CME", "name": "CME Group Inc", "type": "Stock"},
-            {"symbol": "GD", "name": "General Dynamics Corp", "type": "Stock"},
-            {"symbol": "ITW", "name": "Illinois Tool Works", "type": "Stock"},
-            {"symbol": "TRV", "name": "The Travelers Companies", "type": "Stock"},
-            {"symbol": "EIX", "name": "Edison International", "type": "Stock"},
-            {"symbol": "DUK", "name": "Duke Energy Corp", "type": "Stock"},
-            {"symbol": "AEP", "name": "American Electric Power", "type": "Stock"},
-            {"symbol": "SO", "name": "Southern Co", "type": "Stock"},
-            {"symbol": "APD", "name": "Air Products & Chemicals", "type": "Stock"},
-            {"symbol": "BKR", "name": "Baker Hughes Co", "type": "Stock"},
-            {"symbol": "VLO", "name": "Valero Energy Corp", "type": "Stock"},
-            {"symbol": "WELL", "name": "Welltower Inc", "type": "Stock"},
-            {"symbol": "PSA", "name": "Public Storage", "type": "Stock"},
-            {"symbol": "O", "name": "Realty Income Corp", "type": "Stock"},
-            {"symbol": "NOC", "name": "Northrop Grumman Corp", "type": "Stock"},
-            {"symbol": "OXY", "name": "Occidental Petroleum", "type": "Stock"},
-            {"symbol": "ADM", "name": "Archer-Daniels-Midland", "type": "Stock"},
-            {"symbol": "KR", "name": "The Kroger Co", "type": "Stock"},
-            {"symbol": "D", "name": "Dominion Energy Inc", "type": "Stock"},
-            {"symbol": "PCG", "name": "PG&E Corp", "type": "Stock"},
-            {"symbol": "CNP", "name": "CenterPoint Energy", "type": "Stock"},
-            {"symbol": "EXC", "name": "Exelon Corp", "type": "Stock"},
-            {"symbol": "XEL", "name": "Xcel Energy Inc", "type": "Stock"},
-            {"symbol": "F", "name": "Ford Motor Co", "type": "Stock"},
-            {"symbol": "GM", "name": "General Motors Co", "type": "Stock"},
-            {"symbol": "MCHP", "name": "Microchip Technology", "type": "Stock"},
-            {"symbol": "TEL", "name": "TE Connectivity Ltd", "type": "Stock"},
-            {"symbol": "APH", "name": "Amphenol Corp", "type": "Stock"},
-            {"symbol": "KEYS", "name": "Keysight Technologies", "type": "Stock"},
-            {"symbol": "FTNT", "name": "Fortinet Inc", "type": "Stock"},
-            {"symbol": "WDAY", "name": "Workday Inc", "type": "Stock"},
-            {"symbol": "LULU", "name": "Lululemon Athletica", "type": "Stock"},
-            {"symbol": "MNST", "name": "Monster Beverage Corp", "type": "Stock"},
-            {"symbol": "KDP", "name": "Keurig Dr Pepper Inc", "type": "Stock"},
-            {"symbol": "K", "name": "Kellogg Co", "type": "Stock"},
-            {"symbol": "GIS", "name": "General Mills Inc", "type": "Stock"},
-            {"symbol": "CL", "name": "Colgate-Palmolive Co", "type": "Stock"},
-            {"symbol": "HSY", "name": "The Hershey Co", "type": "Stock"},
-            {"symbol": "DASH", "name": "DoorDash Inc", "type": "Stock"},
-            {"symbol": "MKTX", "name": "MarketAxess Holdings", "type": "Stock"},
-            {"symbol": "URBN", "name": "Urban Outfitters", "type": "Stock"}
-                    ]
-        
-        results = [a for a in assets if query in a['symbol'] or query in a['name'].upper()]
-        return results[:10]
+        return self.instruments.search(query, limit=10)
+
+    async def stats(self):
+        return {
+            "stock_provider": self.stocks.stats(),
+            "upstream": [self.crypto_upstream.stats(), self.stocks.upstream.stats()],
+            "history_cache": self.history_cache.stats(),
+        }
+
+    def register_metrics(self):
+        """
+        Scrape-time gauges for the upstream side, registered by whichever
+        process owns this service's upstream clients.
+        """
+        metrics.Collected(
+            "baku_stock_pool_queued", "Stock provider calls waiting for a worker", (),
+            lambda: {(): self.stocks.queued},
+        )
+        metrics.Collected(
+            "baku_upstream_circuit_open", "1 while an upstream provider's circuit breaker is not closed", ("provider",),
+            lambda: {(u.name,): int(u.breaker.state != "closed") for u in (self.crypto_upstream, self.stocks.upstream)},
+        )
 
     async def close(self):
         await self.exchange.close()
+        self.stocks.close()
@@ -0,0 +1,274 @@
+import asyncio
+import time
+from bisect import bisect_left
+
+# Minimal Prometheus text-format metrics. Hot paths only touch a dict
+# lookup and an int/float add; anything that can be read off existing
+# state (connection counts, subscriptions) is collected at scrape time.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.children = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(_format_labels(self.label_names, values), values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, labels, values, child):
+        return [f"{self.name}{labels} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, labels, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _format_labels(self.label_names + ("le",), values + (le,))
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Collected(_Metric):
+    """
+    Gauge whose samples come from collect() -> {label values tuple: value},
+    called at scrape time.
+    """
+
+    def __init__(self, name, help, labels, collect, kind="gauge"):
+        self.collect = collect
+        self.kind = kind
+        super().__init__(name, help, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.collect().items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {value}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def relabel(text, name, value):
+    """
+    Adds a name="value" label to every sample of a rendered exposition, so
+    another process's samples can't collide with ours.
+    """
+    label = _format_labels((name,), (value,))[1:-1]
+    lines = []
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            sample, rest = line.rsplit(" ", 1)
+            if sample.endswith("}"):
+                sample = f"{sample[:-1]},{label}}}"
+            else:
+                sample = f"{sample}{{{label}}}"
+            line = f"{sample} {rest}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def merge(*texts):
+    """
+    Joins rendered expositions; a metric family rendered by several of
+    them keeps one HELP/TYPE header with all their samples.
+    """
+    families = {}  # name -> lines, in first-seen order
+    for text in texts:
+        lines = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name = line.split(" ", 3)[2]
+                lines = families.get(name)
+                if lines is None:
+                    lines = families[name] = [line]
+                    continue
+                lines = families[name]
+            elif line.startswith("# TYPE "):
+                if len(lines) == 1:
+                    lines.append(line)
+            elif line and lines is not None:
+                lines.append(line)
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+UPSTREAM_SECONDS = Histogram(
+    "baku_upstream_request_seconds", "Latency of upstream market data calls", ("provider", "call")
+)
+HTTP_SECONDS = Histogram(
+    "baku_http_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+WS_MESSAGES = Counter("baku_ws_messages_sent_total", "WebSocket frames sent", ("endpoint",))
+WS_BYTES = Counter("baku_ws_bytes_sent_total", "WebSocket payload bytes sent", ("endpoint",))
+WS_SERIALIZE_SECONDS = Histogram(
+    "baku_ws_serialize_seconds", "Time spent encoding WebSocket frames",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+LOOP_LAG_SECONDS = Histogram(
+    "baku_event_loop_lag_seconds", "How late the event loop watchdog woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+UPSTREAM_RETRIES = Counter(
+    "baku_upstream_retries_total", "Upstream calls retried after a transient error", ("provider", "call")
+)
+UPSTREAM_FALLBACKS = Counter(
+    "baku_upstream_fallbacks_total", "Last-known-good results served instead of an upstream call", ("provider", "call")
+)
+ERRORS = Counter("baku_errors_total", "Errors by where they happened and exception type", ("where", "type"))
+
+
+def record_error(where, error):
+    ERRORS.labels(where, type(error).__name__).inc()
+
+
+class timed:
+    """
+    Context manager recording elapsed seconds into a histogram child:
+        with timed(UPSTREAM_SECONDS.labels("binance", "fetch_ticker")): ...
+    """
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+async def watch_event_loop(interval=0.25):
+    """
+    Sleeps for `interval` in a loop and records how much later than
+    requested it woke up, i.e. how long something blocked the loop.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests per route template, so
+    /history/BTC/USDT and /history/AAPL share one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_SECONDS.labels(scope["method"], path, status[0]).observe(time.perf_counter() - start)
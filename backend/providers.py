@@ -0,0 +1,135 @@
+import abc
+import asyncio
+import os
+import sys
+
+# Which upstream MarketDataService talks to: "live" (Binance + yfinance)
+# or "simulated" (deterministic offline data, see simulated.py).
+DEFAULT_PROVIDER = os.getenv("BAKU_PROVIDER", "live")
+
+# Upstream calls per second, (rate, burst). Providers not listed are not
+# throttled. Binance allows 6000 request weight a minute per IP and a
+# ticker costs 2; yfinance has no published limit but starts answering
+# 429 well before this.
+RATE_LIMITS = {
+    "binance": (float(os.getenv("BAKU_BINANCE_RATE", "20")), 40),
+    "yfinance": (float(os.getenv("BAKU_YFINANCE_RATE", "5")), 10),
+}
+# Seconds before an upstream HTTP request is abandoned
+UPSTREAM_TIMEOUT = float(os.getenv("BAKU_UPSTREAM_TIMEOUT", "10"))
+
+
+class CryptoProvider(abc.ABC):
+    """
+    The part of the ccxt async exchange API that MarketDataService uses.
+
+    ccxt exchanges satisfy it as-is; other providers subclass it. Tickers
+    and candles use ccxt's shapes: fetch_ticker returns a dict with 'last',
+    'percentage', 'baseVolume', 'quoteVolume' and 'timestamp' (ms),
+    fetch_ohlcv returns [timestamp_ms, open, high, low, close, volume] lists.
+    """
+
+    timeframes = {}
+
+    @abc.abstractmethod
+    def parse_timeframe(self, timeframe):
+        """Timeframe length in seconds."""
+
+    @abc.abstractmethod
+    def milliseconds(self):
+        """Current exchange time in ms."""
+
+    @abc.abstractmethod
+    async def fetch_ticker(self, symbol):
+        """Ticker dict for symbol."""
+
+    @abc.abstractmethod
+    async def fetch_tickers(self, symbols):
+        """{symbol: ticker dict} for every symbol."""
+
+    @abc.abstractmethod
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        """Up to limit candles starting at since (ms)."""
+
+    @abc.abstractmethod
+    async def load_markets(self):
+        """{symbol: market dict} for everything the exchange lists."""
+
+    async def close(self):
+        pass
+
+
+class StockSource(abc.ABC):
+    """
+    Blocking stock data calls. StockProvider runs them on its worker pool.
+    """
+
+    name = "stocks"
+
+    @abc.abstractmethod
+    def fast_info(self, symbol):
+        """(last_price, previous_close)"""
+
+    @abc.abstractmethod
+    def history(self, symbol, period, interval, start):
+        """yfinance-style DataFrame with Open/High/Low/Close/Volume columns."""
+
+    @abc.abstractmethod
+    def daily_closes(self, symbols):
+        """DataFrame of recent daily closes, one column per symbol."""
+
+
+class YFinanceSource(StockSource):
+    name = "yfinance"
+
+    def __init__(self):
+        import yfinance
+        self.yf = yfinance
+
+    def fast_info(self, symbol):
+        # fast_info fields are lazy and hit the network on first access,
+        # so they have to be read inside the worker thread too.
+        info = self.yf.Ticker(symbol).fast_info
+        return info['last_price'], info['previous_close']
+
+    def history(self, symbol, period, interval, start):
+        if start is not None:
+            return self.yf.Ticker(symbol).history(start=start, interval=interval)
+        return self.yf.Ticker(symbol).history(period=period, interval=interval)
+
+    def daily_closes(self, symbols):
+        # One batched request for every symbol; the last two rows give the
+        # current price and the previous close.
+        data = self.yf.download(symbols, period="5d", interval="1d", progress=False, auto_adjust=False)
+        return data["Close"]
+
+
+def is_transient(error):
+    """
+    Whether an upstream error is worth retrying: network trouble, timeouts
+    and rate limiting, as opposed to e.g. an unknown symbol.
+    """
+    if isinstance(error, (asyncio.TimeoutError, OSError)):
+        return True
+    ccxt = sys.modules.get("ccxt")
+    if ccxt is not None and isinstance(error, ccxt.NetworkError):
+        return True
+    yf_errors = sys.modules.get("yfinance.exceptions")
+    return yf_errors is not None and isinstance(error, yf_errors.YFRateLimitError)
+
+
+def create_providers(name=None):
+    """
+    Returns (crypto_provider, stock_source) for the given provider name.
+    """
+    name = name or DEFAULT_PROVIDER
+    if name == "simulated":
+        from simulated import SimulatedExchange, SimulatedStocks
+        return SimulatedExchange(), SimulatedStocks()
+    if name == "live":
+        import ccxt.async_support as ccxt
+        # One client per process: ccxt keeps a single aiohttp session (and
+        # its keep-alive connection pool) per exchange instance.
+        exchange = ccxt.binance({"enableRateLimit": True, "timeout": int(UPSTREAM_TIMEOUT * 1000)})
+        return exchange, YFinanceSource()
+    raise ValueError(f"Unknown market data provider {name!r}")
@@ -0,0 +1,58 @@
+"""
+Runs the API on several worker processes behind one shared market data feed.
+
+    python serve.py --workers 4 --port 8000
+
+The feed process (feed.py) polls upstream once per streamed ticker and
+fans ticks out to every worker over a Unix socket. History, quotes and
+search are forwarded to it as well, so it holds the only upstream
+clients, rate limits and history cache; workers only serve clients.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uvicorn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for_socket(path, process, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if process.poll() is not None:
+            raise RuntimeError(f"feed exited with code {process.returncode}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"feed did not open {path} within {timeout}s")
+        time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", default=os.path.join(tempfile.gettempdir(), f"baku-feed-{os.getpid()}.sock"))
+    args = parser.parse_args()
+
+    feed = subprocess.Popen([sys.executable, os.path.join(HERE, "feed.py"), "--socket", args.socket], cwd=HERE)
+    try:
+        wait_for_socket(args.socket, feed)
+        # Workers inherit the environment and pick the feed up from it
+        os.environ["BAKU_FEED_SOCKET"] = args.socket
+        os.chdir(HERE)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        feed.terminate()
+        try:
+            feed.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            feed.kill()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from providers import CryptoProvider, StockSource
+
+# Offline stand-ins for Binance and yfinance, used by the benchmark and CI.
+#
+# Prices are a pure function of (symbol, time): a few sine waves at
+# different scales plus hashed noise, so two runs (or two processes) asked
+# for the same symbol and candle always agree and nothing touches the
+# network. Upstream latency is simulated with a configurable sleep.
+
+SIM_LATENCY = float(os.getenv("BAKU_SIM_LATENCY", "0.02"))
+# Synthetic markets returned by load_markets(), on top of the bundled list
+SIM_MARKETS = int(os.getenv("BAKU_SIM_MARKETS", "5000"))
+
+TIMEFRAME_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400,
+    "1h": 3600, "4h": 14400, "1d": 86400, "5d": 5 * 86400, "1wk": 7 * 86400, "1w": 7 * 86400,
+    "1mo": 30 * 86400, "1M": 30 * 86400, "3mo": 91 * 86400,
+}
+PERIOD_SECONDS = {
+    "1h": 3600, "1d": 86400, "5d": 5 * 86400, "1mo": 30 * 86400, "3mo": 91 * 86400,
+    "6mo": 182 * 86400, "1y": 365 * 86400, "2y": 730 * 86400, "5y": 1826 * 86400,
+    "10y": 3652 * 86400, "ytd": 365 * 86400, "max": 3652 * 86400,
+}
+# (period in seconds, relative amplitude)
+WAVES = [(30 * 86400, 0.15), (86400, 0.03), (3600, 0.01), (300, 0.003)]
+NOISE = 0.001
+MAX_SIM_BARS = 5000
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.encode())
+
+
+def _hash_unit(seed, idx):
+    """
+    Deterministic uniform [0, 1) noise per (seed, integer index).
+    """
+    x = np.asarray(idx, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(seed)
+    x ^= x >> np.uint64(33)
+    x *= np.uint64(0xFF51AFD7ED558CCD)
+    x ^= x >> np.uint64(33)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _base_price(seed):
+    return 10 ** ((seed % 500) / 100)  # 1 .. 100k
+
+
+def prices(symbol, seconds):
+    """
+    Simulated price of symbol at each time in seconds (array).
+    """
+    seed = _seed(symbol)
+    seconds = np.asarray(seconds, dtype=np.float64)
+    phase = (seed % 1000) / 1000 * 2 * np.pi
+    level = np.ones_like(seconds)
+    for period, amplitude in WAVES:
+        level += amplitude * np.sin(2 * np.pi * seconds / period + phase)
+    level += NOISE * (_hash_unit(seed, np.floor(seconds)) - 0.5)
+    return _base_price(seed) * level
+
+
+def candles(symbol, timeframe_seconds, start_s, end_s, limit=None, now=None):
+    """
+    [timestamp_ms, open, high, low, close, volume] rows for every candle
+    starting in [start_s, end_s). A candle still open at `now` closes at
+    the current price.
+    """
+    first = int(start_s // timeframe_seconds + (start_s % timeframe_seconds > 0))
+    last = int((end_s - 1) // timeframe_seconds)
+    count = max(0, last - first + 1)
+    if limit is not None:
+        count = min(count, limit)
+    idx = np.arange(first, first + count)
+    starts = idx * timeframe_seconds
+
+    seed = _seed(symbol)
+    opens = prices(symbol, starts)
+    close_times = starts + timeframe_seconds - 1
+    if now is not None:
+        close_times = np.minimum(close_times, now)
+    closes = prices(symbol, close_times)
+    spread = 0.002 * np.sqrt(timeframe_seconds / 60)
+    highs = np.maximum(opens, closes) * (1 + spread * _hash_unit(seed + 1, idx))
+    lows = np.minimum(opens, closes) * (1 - spread * _hash_unit(seed + 2, idx))
+    volumes = 1000 * timeframe_seconds * (0.5 + _hash_unit(seed + 3, idx))
+
+    return np.column_stack([starts * 1000.0, opens, highs, lows, closes, volumes])
+
+
+class SimulatedExchange(CryptoProvider):
+    id = "simulated"
+    timeframes = {tf: tf for tf in ("1m", "5m", "15m", "30m", "1h", "4h", "1d", "1w", "1M")}
+
+    def __init__(self, latency=SIM_LATENCY, markets=SIM_MARKETS, clock=time.time):
+        self.latency = latency
+        self.market_count = markets
+        self.clock = clock
+        self.calls = 0
+
+    def parse_timeframe(self, timeframe):
+        return TIMEFRAME_SECONDS[timeframe]
+
+    def milliseconds(self):
+        return int(self.clock() * 1000)
+
+    async def _upstream(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _ticker(self, symbol, now):
+        last, day_ago = prices(symbol, [now, now - 86400])
+        # Rolling 24h volume that grows through the day
+        rate = 1000 + _seed(symbol) % 9000
+        return {
+            "symbol": symbol,
+            "last": float(last),
+            "percentage": float((last - day_ago) / day_ago * 100),
+            "baseVolume": float(rate * (86400 + now % 86400) / last),
+            "quoteVolume": float(rate * (86400 + now % 86400)),
+            "timestamp": int(now * 1000),
+        }
+
+    async def fetch_ticker(self, symbol):
+        await self._upstream()
+        return self._ticker(symbol, self.clock())
+
+    async def fetch_tickers(self, symbols):
+        await self._upstream()
+        now = self.clock()
+        return {symbol: self._ticker(symbol, now) for symbol in symbols}
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        await self._upstream()
+        limit = limit or 500
+        seconds = self.parse_timeframe(timeframe)
+        now = self.clock()
+        start = since / 1000 if since is not None else now - limit * seconds
+        return candles(symbol, seconds, start, now + 1, limit, now=now).tolist()
+
+    async def load_markets(self):
+        await self._upstream()
+        letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+        markets = {}
+        for i in range(self.market_count):
+            codes = (_hash_unit(i, np.arange(5)) * 26).astype(int)
+            base = "".join(letters[codes[: 3 + i % 3]])
+            symbol = f"{base}/USDT"
+            markets[symbol] = {
+                "symbol": symbol, "base": base, "quote": "USDT", "spot": True, "active": True,
+            }
+        return markets
+
+
+class SimulatedStocks(StockSource):
+    name = "simulated_stocks"
+
+    def __init__(self, latency=SIM_LATENCY, clock=time.time):
+        self.latency = latency
+        self.clock = clock
+
+    def _upstream(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def fast_info(self, symbol):
+        self._upstream()
+        now = self.clock()
+        last, prev_close = prices(symbol, [now, now - now % 86400 - 1])
+        return float(last), float(prev_close)
+
+    def history(self, symbol, period, interval, start):
+        self._upstream()
+        seconds = TIMEFRAME_SECONDS.get(interval, 86400)
+        now = self.clock()
+        if start is not None:
+            start_s = pd.Timestamp(start).timestamp()
+        else:
+            start_s = now - PERIOD_SECONDS.get(period, 86400)
+        start_s = max(start_s, now - MAX_SIM_BARS * seconds)
+        return self._frame(candles(symbol, seconds, start_s, now + 1, now=now))
+
+    def daily_closes(self, symbols):
+        self._upstream()
+        now = self.clock()
+        columns = {s: candles(s, 86400, now - 5 * 86400, now + 1, now=now) for s in symbols}
+        index = pd.to_datetime(next(iter(columns.values()))[:, 0], unit="ms", utc=True) if columns else None
+        return pd.DataFrame({s: rows[:, 4] for s, rows in columns.items()}, index=index)
+
+    def _frame(self, rows):
+        return pd.DataFrame(
+            rows[:, 1:],
+            columns=["Open", "High", "Low", "Close", "Volume"],
+            index=pd.to_datetime(rows[:, 0], unit="ms", utc=True),
+        )
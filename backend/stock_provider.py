@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import UPSTREAM_SECONDS
+
+
+class StockProvider:
+    """
+    Runs a StockSource's blocking calls (yfinance by default) on a bounded
+    thread pool so they never stall the event loop.
+
+    max_concurrency caps how many calls may be in flight at once; extra
+    callers wait (and show up as queued in stats()). A slot is only freed
+    once the worker thread has actually finished, so cancelled or timed
+    out calls cannot pile up behind the pool.
+
+    With an Upstream given, calls are rate limited, retried and guarded by
+    its circuit breaker before they reach the pool.
+    """
+
+    def __init__(self, source, name="yfinance", max_workers=8, max_concurrency=None, timeout=15, upstream=None):
+        self.source = source
+        self.name = name
+        self.upstream = upstream
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency or max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    async def run(self, fn, *args):
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+
+        loop = asyncio.get_running_loop()
+        self.running += 1
+        started = time.perf_counter()
+        call = UPSTREAM_SECONDS.labels(self.name, getattr(fn, "__name__", "call"))
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            # Client went away; drop the call if it has not started yet
+            self.cancelled += 1
+            future.cancel()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            call.observe(time.perf_counter() - started)
+
+        self.completed += 1
+        return result
+
+    def _release(self):
+        self.running -= 1
+        self.slots.release()
+
+    async def _call(self, fn, *args, stale_ok=True):
+        if self.upstream is None:
+            return await self.run(fn, *args)
+        return await self.upstream.call(fn.__name__, self.run, fn, *args, stale_ok=stale_ok)
+
+    async def fast_info(self, symbol):
+        # Live price: never served from the upstream's last-good cache
+        return await self._call(self.source.fast_info, symbol, stale_ok=False)
+
+    async def history(self, symbol, period=None, interval="1d", start=None):
+        return await self._call(self.source.history, symbol, period, interval, start)
+
+    async def daily_closes(self, symbols):
+        """
+        DataFrame of recent daily closes, one column per symbol.
+        """
+        return await self._call(self.source.daily_closes, list(symbols), stale_ok=False)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "saturated": self.running >= self.max_concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
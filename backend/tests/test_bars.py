@@ -0,0 +1,41 @@
+from bars import BarBuilder, BarRing
+
+T0 = 1_749_999_960_000  # on a minute boundary
+
+
+def test_bars_open_update_and_close():
+    builder = BarBuilder({"1s": 1, "1m": 60})
+    events = builder.on_tick(10.0, T0, volume=100.0)
+    assert [(tf, closed) for tf, _, closed in events] == [("1s", False), ("1m", False)]
+    assert list(events[0][1]) == [T0, 10.0, 10.0, 10.0, 10.0, 0.0]
+
+    events = builder.on_tick(12.0, T0 + 500, volume=103.0)
+    assert list(events[0][1]) == [T0, 10.0, 12.0, 10.0, 12.0, 3.0]
+
+    # The first tick of the next second closes the 1s bar
+    events = builder.on_tick(9.0, T0 + 1_000, volume=104.0)
+    assert [(tf, row[0], closed) for tf, row, closed in events] == [
+        ("1s", T0, True), ("1s", T0 + 1_000, False), ("1m", T0, False),
+    ]
+    assert list(events[0][1]) == [T0, 10.0, 12.0, 10.0, 12.0, 3.0]
+    assert list(events[2][1]) == [T0, 10.0, 12.0, 9.0, 9.0, 4.0]
+
+
+def test_late_ticks_and_volume_resets():
+    builder = BarBuilder({"1s": 1})
+    builder.on_tick(10.0, T0 + 1_000, volume=100.0)
+    # A tick for a bar that already closed is ignored
+    assert builder.on_tick(11.0, T0, volume=101.0) == []
+    # The rolling 24h volume dropping doesn't count as traded volume
+    events = builder.on_tick(11.0, T0 + 1_500, volume=50.0)
+    assert events[0][1][5] == 0.0
+    assert builder.on_tick(None, T0 + 2_000) == []
+
+
+def test_ring_keeps_the_newest_bars():
+    ring = BarRing(capacity=3)
+    for t in range(5):
+        ring.append((t, 0, 0, 0, 0, 0))
+    assert list(ring.recent()[:, 0]) == [2, 3, 4]
+    assert list(ring.recent(2)[:, 0]) == [3, 4]
+    assert ring.last()[0] == 4
@@ -0,0 +1,56 @@
+import pytest
+from candle_store import CandleStore, _as_rows
+
+
+def candle(t, close, volume=1.0):
+    return [t, close, close, close, close, volume]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(root=str(tmp_path))
+
+
+def test_merge_appends_newer_candles(store):
+    store.merge("BTC/USDT", "1m", [candle(0, 1), candle(60, 2)])
+    assert store.merge("BTC/USDT", "1m", [candle(0, 9), candle(60, 2), candle(120, 3)]) == 2
+    assert store.read("BTC/USDT", "1m")[:, 4].tolist() == [1, 2, 3]
+
+
+def test_merge_rewrites_the_last_stored_candle(store):
+    store.merge("BTC/USDT", "1m", [candle(0, 1), candle(60, 2, volume=5)])
+    store.merge("BTC/USDT", "1m", [candle(60, 2.5, volume=8), candle(120, 3)])
+    rows = store.read("BTC/USDT", "1m")
+    assert rows[:, 0].tolist() == [0, 60, 120]
+    assert rows[1].tolist() == candle(60, 2.5, volume=8)
+
+
+def test_merge_ignores_older_candles(store):
+    store.merge("BTC/USDT", "1m", [candle(60, 2)])
+    assert store.merge("BTC/USDT", "1m", [candle(0, 1)]) == 0
+    assert len(store.read("BTC/USDT", "1m")) == 1
+
+
+def test_window_and_covered_from(store):
+    store.replace("AAPL", "1d", [candle(t, t) for t in range(0, 500, 100)], covered_from=-100)
+    assert store.window("AAPL", "1d", 250)[:, 0].tolist() == [300, 400]
+    assert store.covered_from("AAPL", "1d") == -100
+    assert store.last_timestamp("AAPL", "1d") == 400
+
+
+def test_as_rows_sorts_and_keeps_the_last_duplicate():
+    rows = _as_rows([candle(120, 3), candle(60, 2), candle(60, 2.5), candle(0, 1)])
+    assert rows[:, 0].tolist() == [0, 60, 120]
+    assert rows[1, 4] == 2.5
+
+
+def test_as_rows_fills_gaps_and_drops_candles_without_a_close():
+    nan = float("nan")
+    rows = _as_rows([[0, nan, nan, nan, 5, nan], [60, 1, 1, 1, nan, 1]])
+    assert rows.tolist() == [[0, 5, 5, 5, 5, 0]]
+
+
+@pytest.mark.parametrize("ticker, timeframe", [("..", "1d"), ("AAPL", "../../escape"), ("../X", "1d")])
+def test_paths_stay_inside_the_root(store, ticker, timeframe):
+    with pytest.raises(ValueError):
+        store.merge(ticker, timeframe, [candle(0, 1)])
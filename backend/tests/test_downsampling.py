@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from downsampling import downsample, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    x = np.arange(5000, dtype=np.float64) * 60_000
+    y = np.cumsum(rng.normal(size=5000)) + 100
+    return x, y
+
+
+@pytest.mark.parametrize("n_out", [3, 4, 100, 4999])
+def test_lttb_indices_are_in_bounds(series, n_out):
+    x, y = series
+    idx = lttb_indices(x, y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_everything_when_asked_for_more(series):
+    x, y = series
+    assert np.array_equal(lttb_indices(x, y, len(x)), np.arange(len(x)))
+
+
+@pytest.mark.parametrize("n_out", [2, 3, 101, 4999])
+def test_minmax_indices_are_in_bounds_and_keep_extremes(series, n_out):
+    _, y = series
+    idx = minmax_indices(y, n_out)
+    assert len(idx) <= n_out
+    assert idx.min() >= 0 and idx.max() < len(y)
+    assert np.all(np.diff(idx) > 0)
+    assert np.argmin(y) in idx and np.argmax(y) in idx
+
+
+def test_minmax_with_an_uneven_last_bucket():
+    y = np.arange(10, dtype=np.float64)
+    idx = minmax_indices(y, 6)
+    assert idx.max() == 9
+
+
+def test_downsample_returns_real_candles(series):
+    x, y = series
+    candles = np.column_stack([x, y, y, y, y, np.ones_like(y)])
+    for algorithm in ("lttb", "minmax"):
+        out = downsample(candles, 200, algorithm)
+        assert len(out) <= 200
+        assert np.isin(out[:, 0], candles[:, 0]).all()
+    assert downsample(candles, None) is candles
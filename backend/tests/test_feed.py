@@ -0,0 +1,89 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+import feed
+from candle_store import CandleStore
+from feed import FeedClient, FeedError, FeedServer
+from market_data import MarketDataService
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = MarketDataService(provider="simulated")
+    service.exchange.latency = 0
+    service.stocks.source.latency = 0
+    service.candle_store = CandleStore(root=str(tmp_path / "candles"))
+    yield service
+    asyncio.run(service.close())
+
+
+async def serving(service, path):
+    server = FeedServer(service, path)
+    task = asyncio.create_task(server.serve())
+    client = FeedClient(path)
+    return server, task, client
+
+
+async def shutdown(server, task, client):
+    await client.close()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await server.hub.close()
+
+
+def test_calls_and_ticks_round_trip(service, tmp_path):
+    async def scenario():
+        server, task, client = await serving(service, str(tmp_path / "feed.sock"))
+        try:
+            rows = await client.get_history("BTC/USDT", "1d", "1h")
+            assert isinstance(rows, np.ndarray)
+            np.testing.assert_array_equal(rows, await service.get_history("BTC/USDT", "1d", "1h"))
+
+            quotes = await client.get_quotes(["BTC", "AAPL"])
+            assert [q["ticker"] for q in quotes] == ["BTC/USDT", "AAPL"]
+            assert await client.search_assets("btc") == json.loads(json.dumps(await service.search_assets("btc")))
+
+            ticks = client.stream_ticker("ETH/USDT")
+            tick = await asyncio.wait_for(ticks.__anext__(), 5)
+            assert tick["ticker"] == "ETH/USDT"
+            assert "ETH/USDT" in server.hub.subscribers
+            await ticks.aclose()
+            await asyncio.sleep(0.05)
+            assert server.hub.subscribers == {}
+        finally:
+            await shutdown(server, task, client)
+
+    asyncio.run(scenario())
+
+
+def test_server_errors_become_feed_errors(service, tmp_path):
+    async def fail(*args):
+        raise ValueError("boom")
+
+    async def scenario():
+        server, task, client = await serving(service, str(tmp_path / "feed.sock"))
+        server.methods["quotes"] = fail
+        try:
+            with pytest.raises(FeedError, match="ValueError: boom"):
+                await client.get_quotes(["BTC"])
+            with pytest.raises(FeedError, match="KeyError"):
+                await client.call("nope")
+        finally:
+            await shutdown(server, task, client)
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(feed, "CONNECT_TIMEOUT", 0.05)
+
+    async def scenario():
+        client = FeedClient(str(tmp_path / "missing.sock"))
+        try:
+            with pytest.raises(FeedError, match="not reachable"):
+                await client.stats()
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
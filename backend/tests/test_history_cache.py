@@ -0,0 +1,97 @@
+import asyncio
+import numpy as np
+import pytest
+import history_cache
+from history_cache import HistoryCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(history_cache.time, "monotonic", clock)
+    return clock
+
+
+def loader(calls, value=None, delay=0.01):
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return np.ones(4) if value is None else value
+    return load
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache, calls = HistoryCache(), []
+        results = await asyncio.gather(*(cache.get("k", 10, loader(calls)) for _ in range(5)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert cache.stats()["coalesced"] == 4 and not cache.inflight
+
+
+def test_entries_expire_after_their_ttl(clock):
+    # The event loop reads the patched clock too, so nothing may sleep
+    async def run():
+        cache, calls = HistoryCache(), []
+        await cache.get("k", 10, loader(calls, delay=0))
+        clock.now += 9
+        await cache.get("k", 10, loader(calls, delay=0))
+        clock.now += 2
+        await cache.get("k", 10, loader(calls, delay=0))
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert len(calls) == 2
+    assert cache.expirations == 1 and cache.hits == 1
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = HistoryCache(max_bytes=3 * 32)
+    for key in "abc":
+        cache.put(key, np.ones(4), 60)
+    cache.entries.move_to_end("a")  # "a" was read most recently
+    cache.put("d", np.ones(4), 60)
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.evictions == 1 and cache.size == 3 * 32
+
+
+def test_empty_results_are_not_cached():
+    async def run():
+        cache, calls = HistoryCache(), []
+        await cache.get("k", 10, loader(calls, value=np.empty(0)))
+        await cache.get("k", 10, loader(calls, value=np.empty(0)))
+        return calls
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_load_is_cancelled_with_its_last_waiter():
+    async def run():
+        cache, calls = HistoryCache(), []
+        waiters = [asyncio.create_task(cache.get("k", 10, loader(calls, delay=10))) for _ in range(2)]
+        await asyncio.sleep(0)
+        load = cache.inflight["k"]
+
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        assert not load.cancelled() and not load.done()
+
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.gather(load, return_exceptions=True)
+        return cache, load
+
+    cache, load = asyncio.run(run())
+    assert load.cancelled()
+    assert not cache.inflight and not cache.waiters
@@ -0,0 +1,52 @@
+import asyncio
+from hub import SubscriptionHub
+from market_data import normalize_ticker
+
+
+class FakeSource:
+    def __init__(self):
+        self.queues = {}
+
+    def normalize_ticker(self, ticker):
+        return normalize_ticker(ticker)
+
+    async def stream_ticker(self, symbol):
+        queue = self.queues[symbol] = asyncio.Queue()
+        while True:
+            yield await queue.get()
+
+    def push(self, symbol, price, timestamp):
+        self.queues[symbol].put_nowait({"ticker": symbol, "price": price, "timestamp": timestamp})
+
+
+def test_poller_runs_while_anyone_is_subscribed():
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        first, second = [], []
+        symbol = hub.subscribe("BTC", first.append)
+        assert symbol == "BTC/USDT"
+        await asyncio.sleep(0)
+        poller = hub.tasks[symbol]
+        source.push(symbol, 1.0, 1_000)
+        await asyncio.sleep(0)
+
+        # A late joiner gets the last tick right away, from the same poller
+        hub.subscribe("BTC/USDT", second.append)
+        assert hub.tasks[symbol] is poller
+        assert [d["price"] for d in second] == [1.0]
+
+        hub.unsubscribe(symbol, first.append)
+        await asyncio.sleep(0)
+        assert not poller.done()
+        source.push(symbol, 2.0, 2_000)
+        await asyncio.sleep(0)
+        assert [d["price"] for d in first] == [1.0]
+        assert [d["price"] for d in second] == [1.0, 2.0]
+
+        hub.unsubscribe(symbol, second.append)
+        await asyncio.sleep(0)
+        assert poller.cancelled()
+        assert hub.tasks == {} and hub.latest == {} and hub.bar_builders == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import indicators
+from indicators import IndicatorSet, InvalidIndicator, compute, create, parse_indicators
+
+SPECS = ["sma:20", "ema:12", "rsi:14", "bb:20:2", "vwap"]
+
+
+@pytest.fixture
+def candles():
+    rng = np.random.default_rng(3)
+    n = 3000
+    times = 1_700_000_000_000 + np.arange(n) * 60_000.0  # spans three UTC days
+    closes = 30000 * np.exp(np.cumsum(rng.normal(scale=0.002, size=n)))
+    opens = np.append(closes[0], closes[:-1])
+    highs = np.maximum(opens, closes) * (1 + rng.uniform(0, 0.001, n))
+    lows = np.minimum(opens, closes) * (1 - rng.uniform(0, 0.001, n))
+    volumes = rng.uniform(1, 100, n)
+    return np.column_stack([times, opens, highs, lows, closes, volumes])
+
+
+def as_array(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("seeded", [0, 5, 500])
+def test_incremental_matches_batch(candles, spec, seeded):
+    expected = create(spec).batch(candles)
+    indicator = create(spec)
+    indicator.seed(candles[:seeded])
+    for i in range(seeded, len(candles)):
+        row = candles[i].tolist()
+        # The forming bar, then the same bar closed
+        peeked = as_array(indicator.peek(row))
+        pushed = as_array(indicator.push(row))
+        np.testing.assert_allclose(peeked, expected[i], rtol=1e-9, equal_nan=True)
+        np.testing.assert_array_equal(peeked, pushed)
+
+
+def test_indicator_set_reports_columns_once_seeded(candles):
+    indicator_set = IndicatorSet()
+    specs = parse_indicators("bb,rsi")
+    assert indicator_set.add("client", specs) == specs
+    assert indicator_set.on_bar(candles[-1], closed=False) == {}
+
+    for spec in specs:
+        indicator_set.seed(spec, candles[:-1])
+    values = indicator_set.on_bar(candles[-1], closed=True)
+    assert set(values) == set(indicators.columns(specs))
+    expected = compute(candles, specs)[-1]
+    np.testing.assert_allclose([values[c] for c in indicators.columns(specs)], expected, rtol=1e-9)
+
+    assert indicator_set.remove("client")
+    assert not indicator_set.indicators
+
+
+def test_parse_indicators_canonicalises():
+    assert parse_indicators(" SMA , sma:20, bb:20:2.0 ,vwap") == ["sma:20", "bb:20:2", "vwap"]
+    assert indicators.columns(["bb:20:2"]) == ["bb:20:2.mid", "bb:20:2.upper", "bb:20:2.lower"]
+
+
+@pytest.mark.parametrize("specs", ["macd", "sma:x", "sma:1", "sma:20:3", "rsi:5000",
+                                   ",".join(f"sma:{p}" for p in range(2, 13))])
+def test_parse_indicators_rejects(specs):
+    with pytest.raises(InvalidIndicator):
+        parse_indicators(specs)
+
+
+def test_only_vwap_needs_volume():
+    assert [s for s in SPECS if indicators.uses_volume(s)] == ["vwap"]
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import main
+from feed import FeedError
+
+
+class DownFeed:
+    """
+    Stands in for a FeedClient whose feed process is gone.
+    """
+
+    async def _down(self, *args):
+        raise FeedError("feed connection lost")
+
+    get_history = get_history_with_indicators = get_quotes = search_assets = stats = _down
+
+
+def get(path, query=""):
+    """
+    Runs one GET through the ASGI app; returns (status, decoded JSON body).
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(main.app(scope, receive, send))
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return sent[0]["status"], json.loads(body)
+
+
+def test_feed_outage_is_a_503(monkeypatch):
+    monkeypatch.setattr(main, "market_service", DownFeed())
+    for path, query in [
+        ("/history/BTC/USDT", ""),
+        ("/history/BTC/USDT", "indicators=sma:20"),
+        ("/quotes", "tickers=BTC,AAPL"),
+        ("/search", "q=btc"),
+    ]:
+        status, body = get(path, query)
+        assert status == 503, path
+        assert "feed" in body["detail"]
+
+
+def test_stats_without_feed(monkeypatch):
+    monkeypatch.setattr(main, "market_service", DownFeed())
+    status, body = get("/stats")
+    assert status == 200
+    assert body["feed"] == {"error": "feed connection lost"}
+    assert "hub" in body and "websockets" in body
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from candle_store import CandleStore
+from market_data import MarketDataService
+
+DAY = 86400
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = MarketDataService(provider="simulated")
+    service.exchange.latency = 0
+    service.stocks.source.latency = 0
+    service.exchange.clock = service.stocks.source.clock = Clock(1_750_000_000.0)
+    service.candle_store = CandleStore(root=str(tmp_path))
+    yield service
+    asyncio.run(service.close())
+
+
+def test_history_after_a_long_idle_period(service):
+    clock = service.exchange.clock
+    first = asyncio.run(service._fetch_history("BTC/USDT", "1d", "1m"))
+    assert len(first) >= 1440
+
+    # Far more 1m candles went by than one request may fetch
+    clock.now += 30 * DAY
+    calls = service.exchange.calls
+    rows = asyncio.run(service._fetch_history("BTC/USDT", "1d", "1m"))
+    assert len(rows) >= 1440
+    assert rows[0, 0] <= (clock.now - DAY) * 1000 + 60_000
+    assert rows[-1, 0] >= (clock.now - 60) * 1000
+    assert service.exchange.calls - calls <= 3
+
+    # The hole before the restart isn't mistaken for covered history
+    assert service.candle_store.covered_from("BTC/USDT", "1m") >= first[-1, 0]
+
+
+def record_calls(owner, method):
+    """
+    Wraps owner.method to record the symbols of every call.
+    """
+    calls = []
+    original = getattr(owner, method)
+
+    def record(symbols):
+        calls.append(list(symbols))
+        return original(symbols)
+
+    setattr(owner, method, record)
+    return calls
+
+
+def test_quotes_batch_each_asset_class(service):
+    tickers = record_calls(service.exchange, "fetch_tickers")
+    closes = record_calls(service.stocks.source, "daily_closes")
+    quotes = asyncio.run(service.get_quotes(["BTC", "AAPL", "BTC/USDT", "ETH/USDT", "MSFT"]))
+
+    # BTC and BTC/USDT are one quote; crypto comes first, in request order
+    assert [q["ticker"] for q in quotes] == ["BTC/USDT", "ETH/USDT", "AAPL", "MSFT"]
+    assert [q["type"] for q in quotes] == ["crypto", "crypto", "stock", "stock"]
+    assert tickers == [["BTC/USDT", "ETH/USDT"]]
+    assert closes == [["AAPL", "MSFT"]]
+
+
+def test_unlisted_crypto_is_left_out(service):
+    tickers = record_calls(service.exchange, "fetch_tickers")
+    service.exchange.markets = {"BTC/USDT": {}, "ETH/USDT": {}}
+    quotes = asyncio.run(service.get_quotes(["BTC", "NOPE/USDT", "ETH/USDT"]))
+    assert [q["ticker"] for q in quotes] == ["BTC/USDT", "ETH/USDT"]
+    assert tickers == [["BTC/USDT", "ETH/USDT"]]
+
+    # Nothing listed: no upstream call at all
+    assert asyncio.run(service.get_quotes(["NOPE/USDT"])) == []
+    assert len(tickers) == 1
+
+
+def test_stock_change_is_against_previous_close(service):
+    closes = asyncio.run(service.stocks.daily_closes(["AAPL"]))["AAPL"]
+    quote, = asyncio.run(service.get_quotes(["AAPL"]))
+    assert quote["price"] == closes.iloc[-1]
+    assert quote["change"] != 0.0
+    assert quote["change"] == pytest.approx((closes.iloc[-1] / closes.iloc[-2] - 1) * 100)
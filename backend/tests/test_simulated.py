@@ -0,0 +1,28 @@
+import asyncio
+from simulated import SimulatedExchange, SimulatedStocks
+
+NOW = 1_750_000_030.5
+
+
+def test_exchange_candles_never_start_after_now():
+    exchange = SimulatedExchange(latency=0, clock=lambda: NOW)
+    for timeframe in ("1m", "1h", "1d"):
+        rows = asyncio.run(exchange.fetch_ohlcv("BTC/USDT", timeframe, limit=10))
+        seconds = exchange.parse_timeframe(timeframe)
+        assert rows[-1][0] <= NOW * 1000
+        # The last candle is the one still open
+        assert rows[-1][0] > (NOW - seconds) * 1000
+
+
+def test_stock_history_never_starts_after_now():
+    stocks = SimulatedStocks(latency=0, clock=lambda: NOW)
+    frame = stocks.history("AAPL", "1d", "1m", None)
+    assert frame.index[-1].timestamp() <= NOW
+
+
+def test_daily_closes_end_with_today():
+    stocks = SimulatedStocks(latency=0, clock=lambda: NOW)
+    closes = stocks.daily_closes(["AAPL"])
+    assert closes.index[-1].timestamp() == NOW - NOW % 86400
+    # Yesterday's close differs from the live price, so quotes show a change
+    assert closes["AAPL"].iloc[-2] != closes["AAPL"].iloc[-1]
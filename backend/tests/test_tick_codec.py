@@ -0,0 +1,90 @@
+import math
+import pytest
+from tick_codec import DELTA, KEYFRAME, TickCodec, TickDecoder
+
+
+def tick(price, change=1.5, volume=1000.0, timestamp=1_700_000_000_000, type="crypto"):
+    return {"ticker": "BTC/USDT", "price": price, "change": change, "volume": volume,
+            "timestamp": timestamp, "type": type}
+
+
+def test_keyframe_then_deltas_round_trip():
+    codec, decoder = TickCodec(), TickDecoder()
+    ticks = [tick(100.0), tick(100.5, timestamp=1_700_000_001_000), tick(100.5, volume=1001.0, timestamp=1_700_000_002_500)]
+
+    first = codec.encode("BTC/USDT", ticks[0])
+    assert first.seq == 1 and first.delta is None
+    decoded = decoder.decode(first.key)
+
+    for data in ticks[1:]:
+        encoded = codec.encode("BTC/USDT", data)
+        assert encoded.delta[0] == DELTA and len(encoded.delta) < len(encoded.key)
+        decoded += decoder.decode(encoded.delta)
+
+    for sent, received in zip(ticks, decoded):
+        assert received["id"] == codec.ticker_id("BTC/USDT")
+        assert received["price"] == sent["price"]
+        assert received["volume"] == sent["volume"]
+        assert received["timestamp"] == sent["timestamp"]
+        assert received["change"] == pytest.approx(sent["change"], rel=1e-6)
+    assert [t["seq"] for t in decoded] == [1, 2, 3]
+
+
+def test_unchanged_fields_are_left_out_of_deltas():
+    codec = TickCodec()
+    codec.encode("BTC/USDT", tick(100.0))
+    same = codec.encode("BTC/USDT", tick(100.0, timestamp=1_700_000_001_000))
+    # Header plus the time delta only
+    assert len(same.delta) == 14
+
+
+def test_same_tick_is_encoded_once():
+    codec = TickCodec()
+    data = tick(100.0)
+    assert codec.encode("BTC/USDT", data) is codec.encode("BTC/USDT", data)
+
+
+def test_delta_after_a_gap_is_rejected():
+    codec, decoder = TickCodec(), TickDecoder()
+    decoder.decode(codec.encode("BTC/USDT", tick(100.0)).key)
+    codec.encode("BTC/USDT", tick(101.0))  # never delivered
+    skipped = codec.encode("BTC/USDT", tick(102.0))
+    with pytest.raises(ValueError):
+        decoder.decode(skipped.delta)
+    # A keyframe resynchronises the client
+    assert decoder.decode(skipped.key)[0]["price"] == 102.0
+
+
+def test_stock_ticks_without_volume():
+    codec, decoder = TickCodec(), TickDecoder()
+    data = tick(190.0, volume=None, type="stock")
+    (received,) = decoder.decode(codec.encode("AAPL", data).key)
+    assert received["type"] == "stock"
+    assert math.isnan(received["volume"])
+
+
+def test_several_records_in_one_frame():
+    codec, decoder = TickCodec(), TickDecoder()
+    btc = codec.encode("BTC/USDT", tick(100.0))
+    eth = codec.encode("ETH/USDT", tick(5.0))
+    received = decoder.decode(btc.key + eth.key)
+    assert [t["id"] for t in received] == [codec.ticker_id("BTC/USDT"), codec.ticker_id("ETH/USDT")]
+    assert btc.key[0] == KEYFRAME
+
+
+def test_last_release_forgets_the_ticker():
+    codec = TickCodec()
+    first_id = codec.acquire("BTC/USDT")
+    assert codec.acquire("BTC/USDT") == first_id
+    codec.encode("BTC/USDT", tick(100.0))
+
+    codec.release("BTC/USDT")
+    assert codec.ids == {"BTC/USDT": first_id}
+    codec.release("BTC/USDT")
+    assert codec.ids == {} and codec.symbols == {} and codec.last == {} and codec.users == {}
+
+    # Coming back starts over, under an id no stale client mapping points at
+    second_id = codec.acquire("BTC/USDT")
+    assert second_id != first_id
+    encoded = codec.encode("BTC/USDT", tick(101.0))
+    assert encoded.seq == 1 and encoded.delta is None
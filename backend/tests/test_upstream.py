@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from upstream import CircuitBreaker, CircuitOpen, Upstream
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=Clock())
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 29
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 2
+    clock.now = 59
+    assert not breaker.allow()
+
+
+def flaky(outcomes):
+    """
+    Async callable raising or returning the given outcomes in turn.
+    """
+    outcomes = list(outcomes)
+
+    async def call(symbol):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return call
+
+
+def upstream(**kwargs):
+    kwargs.setdefault("backoff", 0)
+    return Upstream("test", is_transient=lambda e: isinstance(e, OSError), **kwargs)
+
+
+def test_transient_errors_are_retried():
+    u = upstream(retries=2)
+    assert asyncio.run(u.call("ticker", flaky([OSError(), OSError(), "ok"]), "BTC")) == "ok"
+    assert u.retried == 2 and u.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_errors_are_raised_while_the_breaker_is_closed():
+    u = upstream(retries=1, failure_threshold=5)
+    asyncio.run(u.call("ticker", flaky(["good"]), "BTC"))
+    with pytest.raises(OSError):
+        asyncio.run(u.call("ticker", flaky([OSError(), OSError()]), "BTC"))
+    assert u.fallbacks == 0
+
+
+def test_last_good_result_is_served_while_open():
+    u = upstream(retries=0, failure_threshold=1)
+    asyncio.run(u.call("ticker", flaky(["good"]), "BTC"))
+    assert asyncio.run(u.call("ticker", flaky([OSError()]), "BTC")) == "good"
+    assert u.breaker.state == CircuitBreaker.OPEN
+    # Open: upstream isn't called at all
+    assert asyncio.run(u.call("ticker", flaky([]), "BTC")) == "good"
+    assert u.fallbacks == 2
+    with pytest.raises(CircuitOpen):
+        asyncio.run(u.call("ticker", flaky([]), "ETH"))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(u.call("ticker", flaky([]), "BTC", stale_ok=False))
+
+
+def test_non_transient_errors_do_not_trip_the_breaker():
+    u = upstream(retries=2, failure_threshold=1)
+    with pytest.raises(ValueError):
+        asyncio.run(u.call("ticker", flaky([ValueError("bad symbol")]), "NOPE"))
+    assert u.retried == 0 and u.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,227 @@
+import asyncio
+import json
+from fastapi import WebSocketDisconnect
+from hub import SubscriptionHub
+from market_data import normalize_ticker
+from tick_codec import TickCodec
+import ws_session
+from ws_session import ClientSession
+
+
+class FakeSource:
+    """
+    Upstream whose ticks are pushed by the test.
+    """
+
+    def __init__(self):
+        self.queues = {}
+
+    def normalize_ticker(self, ticker):
+        return normalize_ticker(ticker)
+
+    async def stream_ticker(self, symbol):
+        queue = self.queues[symbol] = asyncio.Queue()
+        while True:
+            yield await queue.get()
+
+    def push(self, symbol, price, timestamp):
+        self.queues[symbol].put_nowait({"ticker": symbol, "price": price, "timestamp": timestamp})
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay=0):
+        self.incoming = asyncio.Queue()
+        self.frames = []
+        self.send_delay = send_delay
+        self.closed = None
+
+    def command(self, action, tickers, **fields):
+        self.incoming.put_nowait(json.dumps({"action": action, "tickers": tickers, **fields}))
+
+    def disconnect(self):
+        self.incoming.put_nowait(None)
+
+    async def receive_text(self):
+        text = await self.incoming.get()
+        if text is None:
+            raise WebSocketDisconnect()
+        return text
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.send_delay)
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+def test_cancelled_session_releases_its_subscriptions():
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        websocket = FakeWebSocket()
+        task = asyncio.create_task(ClientSession(websocket, hub, flush_interval=0).run())
+        websocket.command("subscribe", ["BTC"])
+        await asyncio.sleep(0.01)
+        assert "BTC/USDT" in hub.subscribers
+
+        # Cancelled again while it waits for its reader and writer
+        task.cancel()
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert hub.subscribers == {}
+        assert hub.tasks == {}
+
+    asyncio.run(scenario())
+
+
+async def settle():
+    # Let pollers and the session's tasks run
+    await asyncio.sleep(0.01)
+
+
+def start(websocket, hub, **kwargs):
+    session = ClientSession(websocket, hub, **kwargs)
+    return session, asyncio.create_task(session.run())
+
+
+def test_updates_conflate_per_ticker():
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        websocket = FakeWebSocket()
+        session = ClientSession(websocket, hub)
+        session.handle({"action": "subscribe", "tickers": ["BTC"]})
+        await settle()
+        for price in (1.0, 2.0, 3.0):
+            source.push("BTC/USDT", price, 1_000)
+        await settle()
+        assert session.dropped == 2
+        assert session.pending["BTC/USDT"]["price"] == 3.0
+
+        writer = asyncio.create_task(session._write_loop())
+        await settle()
+        writer.cancel()
+        session.close()
+        assert websocket.frames == [
+            {"type": "subscribed", "tickers": {"BTC": "BTC/USDT"}},
+            {"type": "batch", "updates": [{"ticker": "BTC/USDT", "price": 3.0, "timestamp": 1_000}]},
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_batch_frames_carry_bar_events():
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        websocket = FakeWebSocket()
+        session, task = start(websocket, hub, flush_interval=0.05)
+        websocket.command("subscribe", ["BTC"], bars=["1m"])
+        await settle()
+        source.push("BTC/USDT", 10.0, 60_000)
+        source.push("BTC/USDT", 11.0, 61_000)
+        source.push("BTC/USDT", 12.0, 120_000)
+        await asyncio.sleep(0.1)
+        websocket.disconnect()
+        await task
+
+        kinds = [frame["type"] for frame in websocket.frames]
+        assert kinds[:2] == ["subscribed", "bars_snapshot"]
+        batch = websocket.frames[2]
+        assert batch["type"] == "batch"
+        assert batch["updates"] == [{"ticker": "BTC/USDT", "price": 12.0, "timestamp": 120_000}]
+        # The closed bar is kept apart from the one that replaced it
+        assert [(b["bar"]["time"], b["closed"]) for b in batch["bars"]] == [(60.0, True), (120.0, False)]
+        assert batch["bars"][0]["bar"]["close"] == 11.0
+
+    asyncio.run(scenario())
+
+
+def test_lagging_client_is_disconnected():
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        websocket = FakeWebSocket()
+        session, task = start(websocket, hub, flush_interval=0.2, max_lag=0.05)
+        websocket.command("subscribe", ["BTC"])
+        await settle()
+        source.push("BTC/USDT", 1.0, 1_000)
+        await asyncio.wait_for(task, 1)
+        assert websocket.closed == 1013
+        assert session.max_lag_seen > 0.05
+        await settle()
+        assert hub.subscribers == {} and hub.tasks == {}
+
+    asyncio.run(scenario())
+
+
+def test_blocked_send_disconnects_client():
+    async def scenario():
+        hub = SubscriptionHub(FakeSource())
+        websocket = FakeWebSocket(send_delay=1)
+        session, task = start(websocket, hub, send_timeout=0.05)
+        websocket.command("subscribe", ["BTC"])
+        await asyncio.wait_for(task, 1)
+        assert websocket.closed == 1013
+        assert websocket.frames == []
+        assert hub.subscribers == {}
+
+    asyncio.run(scenario())
+
+
+def test_aliases_share_one_hub_subscription():
+    async def scenario():
+        hub = SubscriptionHub(FakeSource())
+        session = ClientSession(FakeWebSocket(), hub)
+        session.handle({"action": "subscribe", "tickers": ["BTC", "BTC/USDT"]})
+        assert session.subscriptions == {"BTC": "BTC/USDT", "BTC/USDT": "BTC/USDT"}
+        assert len(hub.subscribers["BTC/USDT"]) == 1
+
+        session.handle({"action": "unsubscribe", "tickers": ["BTC"]})
+        assert len(hub.subscribers["BTC/USDT"]) == 1
+        session.handle({"action": "unsubscribe", "tickers": ["BTC/USDT"]})
+        assert hub.subscribers == {}
+        assert hub.tasks == {}
+
+    asyncio.run(scenario())
+
+
+def test_aliases_get_one_bars_snapshot():
+    async def scenario():
+        hub = SubscriptionHub(FakeSource())
+        session = ClientSession(FakeWebSocket(), hub)
+        session.handle({"action": "subscribe", "tickers": ["BTC", "BTC/USDT"], "bars": ["1m", "1h"]})
+        snapshots = [(m["ticker"], m["timeframe"]) for m in session.control if m["type"] == "bars_snapshot"]
+        assert snapshots == [("BTC/USDT", "1m"), ("BTC/USDT", "1h")]
+        session.close()
+
+    asyncio.run(scenario())
+
+
+def test_binary_sessions_release_codec_entries(monkeypatch):
+    codec = TickCodec()
+    monkeypatch.setattr(ws_session, "tick_codec", codec)
+
+    async def scenario():
+        source = FakeSource()
+        hub = SubscriptionHub(source)
+        first = ClientSession(FakeWebSocket(), hub, binary=True)
+        second = ClientSession(FakeWebSocket(), hub, binary=True)
+        first.handle({"action": "subscribe", "tickers": ["BTC", "BTC/USDT", "ETH/USDT"]})
+        second.handle({"action": "subscribe", "tickers": ["BTC"]})
+        await settle()
+        source.push("BTC/USDT", 1.0, 1_000)
+        await settle()
+        assert first.control[0]["ids"] == {"BTC/USDT": codec.ids["BTC/USDT"], "ETH/USDT": codec.ids["ETH/USDT"]}
+        assert codec.users == {"BTC/USDT": 2, "ETH/USDT": 1}
+
+        first.handle({"action": "unsubscribe", "tickers": ["ETH/USDT"]})
+        first.close()
+        assert set(codec.ids) == {"BTC/USDT"}
+        second.handle({"action": "unsubscribe", "tickers": ["BTC"]})
+        assert codec.ids == {} and codec.symbols == {} and codec.last == {} and codec.users == {}
+
+    asyncio.run(scenario())
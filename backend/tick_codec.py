@@ -0,0 +1,170 @@
+import itertools
+import math
+import struct
+import time
+from metrics import WS_SERIALIZE_SECONDS
+
+# Binary tick protocol, negotiated with the "baku.ticks.v1" WebSocket
+# subprotocol. Commands and replies stay JSON text frames; price ticks go
+# out as binary frames holding one or more little-endian records:
+#
+#   keyframe  B kind=1, I ticker id, I seq, B flags, d price, f change,
+#             d volume, q timestamp ms                            (38 bytes)
+#   delta     B kind=2, I ticker id, I seq, B mask, then only the fields
+#             whose bit is set in mask (1 price d, 2 change f, 4 volume d),
+#             then i timestamp ms relative to the previous tick  (14+ bytes)
+#
+# Ticker ids are global and handed out on first subscribe; the
+# "subscribed" reply maps tickers to ids. An id is dropped when the last
+# binary subscriber of its ticker leaves and never reused; subscribing
+# again hands out a new one. seq counts ticks per ticker, and
+# a delta is always relative to tick seq - 1, so the server only sends one
+# to a client that has that tick. Missing values (no volume for stocks)
+# are NaN. flags bit 1 marks crypto.
+#
+# Each tick is encoded once, both ways, and the same bytes are sent to
+# every subscriber.
+
+PROTOCOL = "baku.ticks.v1"
+
+KEYFRAME, DELTA = 1, 2
+FLAG_CRYPTO = 1
+MASK_PRICE, MASK_CHANGE, MASK_VOLUME = 1, 2, 4
+
+_KEY = struct.Struct("<BIIBdfdq")
+_DELTA_HEAD = struct.Struct("<BIIB")
+_F64 = struct.Struct("<d")
+_F32 = struct.Struct("<f")
+_TIME_DELTA = struct.Struct("<i")
+_FIELDS = ((MASK_PRICE, "price", _F64), (MASK_CHANGE, "change", _F32), (MASK_VOLUME, "volume", _F64))
+
+
+def _number(value):
+    return math.nan if value is None else float(value)
+
+
+class EncodedTick:
+    __slots__ = ("data", "seq", "key", "delta")
+
+    def __init__(self, data, seq, key, delta):
+        self.data = data
+        self.seq = seq
+        self.key = key
+        self.delta = delta
+
+
+class TickCodec:
+    """
+    Assigns ticker ids and encodes every hub tick once. encode() is called
+    by each subscribed session with the same dict the hub fanned out, so
+    all but the first call are a lookup.
+    """
+
+    def __init__(self):
+        self.ids = {}  # symbol -> ticker id
+        self.symbols = {}  # ticker id -> symbol
+        self.last = {}  # symbol -> EncodedTick
+        self.users = {}  # symbol -> sessions that acquired it
+        self._next_id = itertools.count(1)
+
+    def acquire(self, symbol):
+        """
+        Registers one more session streaming symbol and returns its id.
+        """
+        self.users[symbol] = self.users.get(symbol, 0) + 1
+        return self.ticker_id(symbol)
+
+    def release(self, symbol):
+        """
+        Undoes acquire(); the last release forgets symbol's id and tick.
+        """
+        users = self.users.get(symbol, 0) - 1
+        if users > 0:
+            self.users[symbol] = users
+            return
+        self.users.pop(symbol, None)
+        self.last.pop(symbol, None)
+        self.symbols.pop(self.ids.pop(symbol, None), None)
+
+    def ticker_id(self, symbol):
+        ticker_id = self.ids.get(symbol)
+        if ticker_id is None:
+            ticker_id = self.ids[symbol] = next(self._next_id)
+            self.symbols[ticker_id] = symbol
+        return ticker_id
+
+    def encode(self, symbol, data):
+        previous = self.last.get(symbol)
+        if previous is not None and previous.data is data:
+            return previous
+
+        started = time.perf_counter()
+        ticker_id = self.ticker_id(symbol)
+        seq = (previous.seq + 1) & 0xFFFFFFFF if previous else 1
+        timestamp = int(data.get("timestamp") or 0)
+        key = _KEY.pack(
+            KEYFRAME, ticker_id, seq, FLAG_CRYPTO if data.get("type") == "crypto" else 0,
+            _number(data.get("price")), _number(data.get("change")), _number(data.get("volume")), timestamp,
+        )
+
+        delta = None
+        if previous is not None:
+            mask = 0
+            parts = []
+            # Compare encoded bytes, so NaN == NaN and float32 rounding of
+            # the change is what the client actually sees
+            for bit, field, codec in _FIELDS:
+                value = codec.pack(_number(data.get(field)))
+                if value != codec.pack(_number(previous.data.get(field))):
+                    mask |= bit
+                    parts.append(value)
+            elapsed = timestamp - int(previous.data.get("timestamp") or 0)
+            if -2**31 <= elapsed < 2**31:
+                parts.append(_TIME_DELTA.pack(elapsed))
+                delta = _DELTA_HEAD.pack(DELTA, ticker_id, seq, mask) + b"".join(parts)
+
+        encoded = self.last[symbol] = EncodedTick(data, seq, key, delta)
+        WS_SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        return encoded
+
+
+class TickDecoder:
+    """
+    Client side of the protocol, for tests and the benchmark: feed it
+    binary frames, get back full tick dicts keyed by ticker id.
+    """
+
+    def __init__(self):
+        self.state = {}  # ticker id -> last decoded tick
+
+    def decode(self, frame):
+        ticks = []
+        offset = 0
+        while offset < len(frame):
+            kind = frame[offset]
+            if kind == KEYFRAME:
+                _, ticker_id, seq, flags, price, change, volume, timestamp = _KEY.unpack_from(frame, offset)
+                offset += _KEY.size
+                tick = {
+                    "id": ticker_id, "seq": seq, "price": price, "change": change, "volume": volume,
+                    "timestamp": timestamp, "type": "crypto" if flags & FLAG_CRYPTO else "stock",
+                }
+            elif kind == DELTA:
+                _, ticker_id, seq, mask = _DELTA_HEAD.unpack_from(frame, offset)
+                offset += _DELTA_HEAD.size
+                previous = self.state.get(ticker_id)
+                if previous is None or previous["seq"] != (seq - 1) & 0xFFFFFFFF:
+                    raise ValueError(f"delta {seq} for ticker {ticker_id} without its previous tick")
+                tick = dict(previous, seq=seq)
+                for bit, field, codec in _FIELDS:
+                    if mask & bit:
+                        (tick[field],) = codec.unpack_from(frame, offset)
+                        offset += codec.size
+                (elapsed,) = _TIME_DELTA.unpack_from(frame, offset)
+                offset += _TIME_DELTA.size
+                tick["timestamp"] = previous["timestamp"] + elapsed
+            else:
+                raise ValueError(f"unknown record kind {kind}")
+            self.state[ticker_id] = tick
+            ticks.append(tick)
+        return ticks
@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from metrics import UPSTREAM_FALLBACKS, UPSTREAM_RETRIES
+
+# Guard rails around one upstream provider (Binance, yfinance, ...):
+# a token bucket so bursts of client requests can't exceed the provider's
+# rate limit, retries with jittered exponential backoff for transient
+# errors, and a circuit breaker that stops calling a failing provider for
+# a while. While the breaker is open, the last good answer to the same
+# call is served instead; calls for live values (ticks) can opt out so a
+# stale price is never passed off as a fresh one.
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class RateLimiter:
+    """
+    Token bucket: `rate` calls per second on average, bursts of up to
+    `burst`. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = asyncio.Lock()
+        self.waited = 0.0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed a single probe call is let
+    through: success closes the breaker, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probing = False
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self.probing = False
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class Upstream:
+    """
+    call(name, fn, *args) awaits fn(*args) through the rate limiter, retry
+    and circuit breaker. `is_transient(error)` decides what is worth
+    retrying; anything else (a bad symbol, say) is raised straight away
+    and does not count against the provider. Once retries run out the
+    error is raised, unless the breaker is open and stale_ok allows the
+    last good result to be served.
+    """
+
+    def __init__(self, name, rate=None, burst=None, retries=2, backoff=0.5, max_backoff=8,
+                 failure_threshold=5, reset_timeout=30, is_transient=None, fallback_size=1024):
+        self.name = name
+        self.limiter = RateLimiter(rate, burst) if rate else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.is_transient = is_transient or (lambda e: True)
+        self.fallback_size = fallback_size
+        self.last_good = OrderedDict()  # (name, args) -> last successful result
+
+        self.calls = 0
+        self.retried = 0
+        self.fallbacks = 0
+
+    async def call(self, name, fn, *args, stale_ok=True, **kwargs):
+        key = (name, _freeze(args), _freeze(kwargs)) if stale_ok else None
+        self.calls += 1
+        if not self.breaker.allow():
+            return self._fallback(key, CircuitOpen(f"{self.name} circuit open"))
+
+        for attempt in range(self.retries + 1):
+            if self.limiter:
+                await self.limiter.acquire()
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                    self.breaker.probing = False
+                raise
+            except Exception as e:
+                if not self.is_transient(e):
+                    # Upstream answered, it just didn't like the request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if self.breaker.state == CircuitBreaker.OPEN:
+                    return self._fallback(key, e)
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                UPSTREAM_RETRIES.labels(self.name, name).inc()
+                # Full jitter, so clients that failed together don't retry together
+                await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                continue
+
+            self.breaker.record_success()
+            if key is not None:
+                self._remember(key, result)
+            return result
+
+    def _remember(self, key, result):
+        self.last_good[key] = result
+        self.last_good.move_to_end(key)
+        if len(self.last_good) > self.fallback_size:
+            self.last_good.popitem(last=False)
+
+    def _fallback(self, key, error):
+        if key is None or key not in self.last_good:
+            raise error
+        self.fallbacks += 1
+        UPSTREAM_FALLBACKS.labels(self.name, key[0]).inc()
+        return self.last_good[key]
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rate": self.limiter.rate if self.limiter else None,
+            "throttled_seconds": round(self.limiter.waited, 3) if self.limiter else 0.0,
+            "circuit": self.breaker.state,
+            "trips": self.breaker.trips,
+            "calls": self.calls,
+            "retries": self.retried,
+            "fallbacks": self.fallbacks,
+            "cached": len(self.last_good),
+        }
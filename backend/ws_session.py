@@ -0,0 +1,413 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from fastapi import WebSocketDisconnect
+from bars import TIMEFRAMES
+from history_format import to_columns
+from indicators import InvalidIndicator, columns as indicator_columns, parse_indicators
+from metrics import WS_BYTES, WS_MESSAGES, WS_SERIALIZE_SECONDS, record_error
+from tick_codec import TickCodec
+
+# How often a multiplexed client receives its batched updates (seconds)
+FLUSH_INTERVAL = 1.0
+# Upper bound on tickers a single connection may follow
+MAX_SUBSCRIPTIONS = 50
+
+# Slow-consumer thresholds. A client whose oldest unsent update is older
+# than MAX_LAG, or whose socket does not accept a frame within
+# SEND_TIMEOUT, is disconnected. Replies to commands are not conflated,
+# so at most MAX_CONTROL of them may be waiting.
+MAX_LAG = float(os.getenv("BAKU_WS_MAX_LAG", "15"))
+SEND_TIMEOUT = float(os.getenv("BAKU_WS_SEND_TIMEOUT", "10"))
+MAX_CONTROL = int(os.getenv("BAKU_WS_MAX_CONTROL", "64"))
+
+# Close code sent to clients that fell too far behind ("try again later")
+CLOSE_TOO_SLOW = 1013
+
+active_sessions = set()
+_session_ids = itertools.count(1)
+# Shared by every binary session, so a tick is encoded once
+tick_codec = TickCodec()
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+def _string_list(message, field):
+    """
+    message[field] as a list of strings (a lone string counts as one), or
+    None if it is something else.
+    """
+    value = message.get(field) or []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        return None
+    return value
+
+
+class ClientSession:
+    """
+    One WebSocket connection and its outbound buffer.
+
+    Price updates are conflated: only the newest update per ticker waits to
+    be sent, so a slow client skips intermediate ticks instead of building
+    an unbounded backlog, and a separate writer task does the sending so
+    the hub never waits on a socket.
+
+    In multiplexed mode (/ws) clients send
+    {"action": "subscribe" | "unsubscribe", "tickers": [...]} and receive
+    one {"type": "batch", "updates": [...]} frame per flush interval.
+    Subscribing with "bars": ["1m", ...] also streams live candles built
+    from the ticks: a "bars_snapshot" per timeframe right away, then the
+    batch frames carry "bar" events (updated, or closed) under "bars".
+    Adding "indicators": ["sma:20", "rsi:14", ...] adds their values for
+    each bar to the events' "indicators" field. With
+    batched=False each update is sent as-is, as soon as possible, which is
+    what the legacy /ws/{ticker} endpoint uses.
+
+    With binary=True (the tick_codec subprotocol) ticks are sent as binary
+    records instead: a delta when the client has the ticker's previous
+    tick, a keyframe otherwise. Bar events then go out as
+    {"type": "bars", "bars": [...]} text frames.
+    """
+
+    def __init__(self, websocket, hub, batched=True, flush_interval=FLUSH_INTERVAL,
+                 max_lag=MAX_LAG, send_timeout=SEND_TIMEOUT, binary=False):
+        self.id = next(_session_ids)
+        self.websocket = websocket
+        self.hub = hub
+        self.batched = batched
+        self.binary = binary
+        self.flush_interval = flush_interval if batched else 0
+        self.max_lag = max_lag
+        self.send_timeout = send_timeout
+
+        self.subscriptions = {}  # requested ticker -> normalized symbol
+        self.callbacks = {}  # normalized symbol -> hub callback
+        self.bar_callbacks = {}  # normalized symbol -> hub bar callback
+        self.indicator_columns = {}  # normalized symbol -> indicator columns asked for
+        # symbol -> latest unsent tick, (symbol, timeframe, bar time) -> latest bar event
+        self.pending = {}
+        self.pending_since = None  # when the oldest unsent update arrived
+        self.control = []  # unsent replies to commands
+        self.sent_seq = {}  # symbol -> seq of the last binary tick sent
+        self.ready = asyncio.Event()
+
+        self.sent = 0
+        self.dropped = 0
+        self.max_lag_seen = 0.0
+        self.connected_at = time.monotonic()
+        endpoint = "/ws" if batched else "/ws/{ticker}"
+        self.messages_metric = WS_MESSAGES.labels(endpoint)
+        self.bytes_metric = WS_BYTES.labels(endpoint)
+
+    async def run(self):
+        active_sessions.add(self)
+        reader = asyncio.create_task(self._read_loop())
+        writer = asyncio.create_task(self._write_loop())
+        try:
+            done, _ = await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer in done and isinstance(writer.exception(), SlowConsumer):
+                record_error("websocket.slow_consumer", writer.exception())
+                print(f"Disconnecting slow client {self.id}: {writer.exception()}")
+                try:
+                    await asyncio.wait_for(
+                        self.websocket.close(code=CLOSE_TOO_SLOW, reason="too slow"), self.send_timeout
+                    )
+                except Exception:
+                    pass
+            else:
+                for task in done:
+                    error = task.exception()
+                    if error and not isinstance(error, WebSocketDisconnect):
+                        raise error
+        finally:
+            reader.cancel()
+            writer.cancel()
+            # Drop the hub subscriptions before awaiting anything, so they
+            # are released even if run() itself is cancelled here
+            active_sessions.discard(self)
+            self.close()
+            # A send interrupted by the disconnect can still fail; collect it
+            await asyncio.gather(reader, writer, return_exceptions=True)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                if not self.batched:
+                    # Legacy clients only listen
+                    continue
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    self._error("invalid JSON")
+                    continue
+                self.handle(message)
+        except WebSocketDisconnect:
+            pass
+
+    def handle(self, message):
+        if not isinstance(message, dict):
+            self._error("expected a JSON object")
+            return
+
+        action = message.get("action")
+        tickers = _string_list(message, "tickers")
+        if tickers is None:
+            self._error("tickers must be a list of strings")
+            return
+        tickers = [t.upper() for t in tickers]
+
+        if action == "subscribe":
+            # Check the whole command before subscribing to anything
+            bars = _string_list(message, "bars")
+            if bars is None:
+                self._error("bars must be a list of timeframes")
+                return
+            unknown = [tf for tf in bars if tf not in TIMEFRAMES]
+            if unknown:
+                self._error(f"unknown bar timeframe {', '.join(unknown)}, expected one of {', '.join(TIMEFRAMES)}")
+                return
+            indicators = _string_list(message, "indicators")
+            if indicators is None:
+                self._error("indicators must be a list of specs")
+                return
+            try:
+                specs = parse_indicators(indicators)
+            except InvalidIndicator as e:
+                self._error(str(e))
+                return
+
+            for ticker in tickers:
+                if ticker in self.subscriptions:
+                    continue
+                if len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+                    self._error(f"subscription limit of {MAX_SUBSCRIPTIONS} reached")
+                    break
+                self.subscribe(ticker)
+            reply = {"type": "subscribed", "tickers": dict(self.subscriptions)}
+            if self.binary:
+                reply["ids"] = {s: tick_codec.ticker_id(s) for s in self.subscriptions.values()}
+            self._reply(reply)
+            if bars:
+                # 'BTC' and 'BTC/USDT' are one series; one snapshot each
+                symbols = {self.subscriptions[t]: None for t in tickers if t in self.subscriptions}
+                for symbol in symbols:
+                    self.subscribe_bars(symbol, bars, specs)
+        elif action == "unsubscribe":
+            for ticker in tickers:
+                self.unsubscribe(ticker)
+            self._reply({"type": "unsubscribed", "tickers": tickers})
+        else:
+            self._error(f"unknown action {action!r}")
+
+    def subscribe(self, ticker):
+        symbol = self.hub.normalize_ticker(ticker)
+        self.subscriptions[ticker] = symbol
+        # 'BTC' and 'BTC/USDT' share one hub subscription
+        if symbol not in self.callbacks:
+            callback = lambda data, symbol=symbol: self._on_tick(symbol, data)
+            self.callbacks[symbol] = callback
+            if self.binary:
+                tick_codec.acquire(symbol)
+            self.hub.subscribe(symbol, callback)
+
+    def unsubscribe(self, ticker):
+        symbol = self.subscriptions.pop(ticker, None)
+        if symbol is None or symbol in self.subscriptions.values():
+            return
+        bar_callback = self.bar_callbacks.pop(symbol, None)
+        if bar_callback:
+            self.hub.unsubscribe_bars(symbol, bar_callback)
+        self.indicator_columns.pop(symbol, None)
+        callback = self.callbacks.pop(symbol)
+        self.hub.unsubscribe(symbol, callback)
+        if self.binary:
+            tick_codec.release(symbol)
+        self.sent_seq.pop(symbol, None)
+        for key in [k for k in self.pending if k == symbol or (isinstance(k, tuple) and k[0] == symbol)]:
+            del self.pending[key]
+
+    def subscribe_bars(self, symbol, timeframes, indicators=()):
+        callback = self.bar_callbacks.get(symbol)
+        if callback is None:
+            callback = self.bar_callbacks[symbol] = self._on_bar
+        supported = self.hub.live_indicators(symbol, indicators)
+        if len(supported) < len(indicators):
+            unsupported = ", ".join(s for s in indicators if s not in supported)
+            self._error(f"{unsupported} needs volume, which live {symbol} ticks don't carry")
+        indicators = supported
+        if indicators:
+            self.indicator_columns.setdefault(symbol, set()).update(indicator_columns(indicators))
+        recent = self.hub.subscribe_bars(symbol, timeframes, callback, indicators)
+        for tf, rows in recent.items():
+            self._reply({
+                "type": "bars_snapshot",
+                "ticker": symbol,
+                "timeframe": tf,
+                "bars": to_columns(rows),
+            })
+
+    def _on_tick(self, symbol, data):
+        if symbol not in self.callbacks:
+            # Fanned out before we unsubscribed; don't re-register a
+            # released codec entry or queue a tick nobody wants
+            return
+        if self.binary:
+            data = tick_codec.encode(symbol, data)
+        self._on_update(symbol, data)
+
+    def _on_bar(self, event):
+        values = event.get("indicators")
+        if values is not None:
+            # The hub computes every indicator anyone asked for on this
+            # series; only pass on ours
+            wanted = self.indicator_columns.get(event["ticker"], ())
+            if values.keys() - wanted:
+                event = {k: v for k, v in event.items() if k != "indicators"}
+                if wanted:
+                    event["indicators"] = {k: v for k, v in values.items() if k in wanted}
+        # Updates to the same bar conflate; a closed bar and the next one
+        # have different keys, so a close is never overwritten.
+        self._on_update((event["ticker"], event["timeframe"], event["bar"]["time"]), event)
+
+    def _on_update(self, symbol, data):
+        if symbol in self.pending:
+            # The client never saw the previous value; conflate it away
+            self.dropped += 1
+        elif not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending[symbol] = data
+        self.ready.set()
+
+    def _reply(self, message):
+        if len(self.control) >= MAX_CONTROL:
+            # Commands keep coming but nothing is read back; stop queueing
+            self.dropped += 1
+            return
+        self.control.append(message)
+        self.ready.set()
+
+    def _error(self, message):
+        self._reply({"type": "error", "message": message})
+
+    def lag(self):
+        if not self.pending:
+            return 0.0
+        return time.monotonic() - self.pending_since
+
+    async def _write_loop(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+
+            while self.control:
+                await self._send(self.control.pop(0))
+
+            if self.pending:
+                lag = self.lag()
+                self.max_lag_seen = max(self.max_lag_seen, lag)
+                if lag > self.max_lag:
+                    raise SlowConsumer(f"{lag:.1f}s behind")
+
+                updates = list(self.pending.items())
+                self.pending.clear()
+                if self.binary:
+                    await self._flush_binary(updates)
+                elif self.batched:
+                    frame = {"type": "batch", "updates": [u for k, u in updates if not isinstance(k, tuple)]}
+                    bars = [u for k, u in updates if isinstance(k, tuple)]
+                    if bars:
+                        frame["bars"] = bars
+                    await self._send(frame)
+                else:
+                    for _, update in updates:
+                        await self._send(update)
+
+            if self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+
+    async def _flush_binary(self, updates):
+        records = []
+        bars = []
+        for key, update in updates:
+            if isinstance(key, tuple):
+                bars.append(update)
+                continue
+            # Already encoded and shared with every other subscriber
+            continuous = update.delta is not None and self.sent_seq.get(key) == update.seq - 1
+            records.append(update.delta if continuous else update.key)
+            self.sent_seq[key] = update.seq
+
+        if self.batched:
+            if records:
+                await self._send_bytes(b"".join(records))
+        else:
+            for record in records:
+                await self._send_bytes(record)
+        if bars:
+            await self._send({"type": "bars", "bars": bars})
+
+    async def _send(self, message):
+        started = time.perf_counter()
+        text = json.dumps(message, separators=(",", ":"))
+        WS_SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        await self._transmit(self.websocket.send_text(text), len(text))
+
+    async def _send_bytes(self, payload):
+        await self._transmit(self.websocket.send_bytes(payload), len(payload))
+
+    async def _transmit(self, sending, size):
+        try:
+            await asyncio.wait_for(sending, self.send_timeout)
+        except asyncio.TimeoutError:
+            raise SlowConsumer(f"send blocked for more than {self.send_timeout}s")
+        self.sent += 1
+        self.messages_metric.inc()
+        self.bytes_metric.inc(size)
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "tickers": len(self.callbacks),
+            "bar_tickers": len(self.bar_callbacks),
+            "lag": round(self.lag(), 3),
+            "max_lag": round(self.max_lag_seen, 3),
+            "pending": len(self.pending) + len(self.control),
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        for symbol, callback in self.bar_callbacks.items():
+            self.hub.unsubscribe_bars(symbol, callback)
+        self.bar_callbacks.clear()
+        self.indicator_columns.clear()
+        for symbol, callback in self.callbacks.items():
+            self.hub.unsubscribe(symbol, callback)
+            if self.binary:
+                tick_codec.release(symbol)
+        self.callbacks.clear()
+        self.subscriptions.clear()
+        self.pending.clear()
+        self.sent_seq.clear()
+
+
+def sessions_stats(top=20):
+    """
+    Aggregate counters plus the most lagging clients.
+    """
+    sessions = [s.stats() for s in active_sessions]
+    sessions.sort(key=lambda s: (s["lag"], s["dropped"]), reverse=True)
+    return {
+        "clients": len(sessions),
+        "sent": sum(s["sent"] for s in sessions),
+        "dropped": sum(s["dropped"] for s in sessions),
+        "max_lag": max((s["lag"] for s in sessions), default=0.0),
+        "slowest": sessions[:top],
+    }
@@ -1,5 +1,6 @@
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Chart } from './Chart';
+import { subscribeTicker } from '../lib/marketSocket';
 import { ArrowUp, ArrowDown, X, Clock, Activity, Maximize2 } from 'lucide-react';
 
 export const ChartWidget = ({ id, ticker, onClose }) => {
@@ -7,7 +8,6 @@ export const ChartWidget = ({ id, ticker, onClose }) => {
     const [currentPrice, setCurrentPrice] = useState(null);
     const [data, setData] = useState([]);
     const [status, setStatus] = useState('connecting');
-    const ws = useRef(null);
 
     // Fetch History
     useEffect(() => {
@@ -29,7 +29,8 @@ export const ChartWidget = ({ id, ticker, onClose }) => {
 
                 // Encode ticker (e.g., BTC/USDT -> BTC%2FUSDT)
                 const encodedTicker = ticker.replace('/', '%2F');
-                const res = await fetch(`http://localhost:8000/history/${encodedTicker}?period=${period}&interval=${interval}`);
+                // The chart is a few hundred pixels wide; let the server thin out long ranges
+                const res = await fetch(`http://localhost:8000/history/${encodedTicker}?period=${period}&interval=${interval}&max_points=1000`);
                 const history = await res.json();
 
                 if (Array.isArray(history)) {
@@ -44,16 +45,8 @@ export const ChartWidget = ({ id, ticker, onClose }) => {
 
         fetchHistory();
 
-        // Re-establish WS on ticker change or just init
-        if (ws.current) ws.current.close();
-
-        const socket = new WebSocket(`ws://127.0.0.1:8000/ws/${ticker}`);
-        ws.current = socket;
-
-        socket.onopen = () => setStatus('connected');
-
-        socket.onmessage = (event) => {
-            const message = JSON.parse(event.data);
+        // Live ticks come over the shared multiplexed socket
+        const unsubscribe = subscribeTicker(ticker, (message) => {
             setCurrentPrice(message);
 
             setData((prev) => {
@@ -67,11 +60,9 @@ export const ChartWidget = ({ id, ticker, onClose }) => {
                 if (newData.length > 3000) return newData.slice(-3000);
                 return newData;
             });
-        };
-
-        socket.onclose = () => setStatus('disconnected');
+        }, setStatus);
 
-        return () => socket.close();
+        return unsubscribe;
     }, [ticker, timeRange]);
 
 
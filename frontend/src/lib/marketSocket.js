@@ -0,0 +1,85 @@
+// One shared WebSocket to the multiplexed /ws endpoint for every chart on the page.
+// Widgets call subscribeTicker() and get updates for their ticker only; switching
+// tickers is a subscribe/unsubscribe message instead of a new connection.
+
+const WS_URL = 'ws://127.0.0.1:8000/ws';
+const RECONNECT_DELAY = 2000;
+
+let socket = null;
+let reconnectTimer = null;
+const listeners = new Map();      // requested ticker -> Set of { onUpdate, onStatus }
+const aliases = new Map();        // server symbol (e.g. BTC/USDT) -> Set of requested tickers
+
+const isOpen = () => socket && socket.readyState === WebSocket.OPEN;
+
+const send = (message) => {
+    if (isOpen()) socket.send(JSON.stringify(message));
+};
+
+const notifyStatus = (status) => {
+    listeners.forEach((subs) => subs.forEach((sub) => sub.onStatus && sub.onStatus(status)));
+};
+
+const handleMessage = (event) => {
+    const message = JSON.parse(event.data);
+
+    if (message.type === 'subscribed') {
+        Object.entries(message.tickers).forEach(([requested, symbol]) => {
+            if (!aliases.has(symbol)) aliases.set(symbol, new Set());
+            aliases.get(symbol).add(requested);
+        });
+    } else if (message.type === 'batch') {
+        message.updates.forEach((update) => {
+            (aliases.get(update.ticker) || []).forEach((requested) => {
+                (listeners.get(requested) || []).forEach((sub) => sub.onUpdate(update));
+            });
+        });
+    } else if (message.type === 'error') {
+        console.error('Market socket error:', message.message);
+    }
+};
+
+const connect = () => {
+    if (socket) return;
+
+    socket = new WebSocket(WS_URL);
+    socket.onopen = () => {
+        notifyStatus('connected');
+        if (listeners.size) send({ action: 'subscribe', tickers: [...listeners.keys()] });
+    };
+    socket.onmessage = handleMessage;
+    socket.onclose = () => {
+        socket = null;
+        aliases.clear();
+        notifyStatus('disconnected');
+        if (listeners.size && !reconnectTimer) {
+            reconnectTimer = setTimeout(() => {
+                reconnectTimer = null;
+                connect();
+            }, RECONNECT_DELAY);
+        }
+    };
+};
+
+export const subscribeTicker = (ticker, onUpdate, onStatus) => {
+    const sub = { onUpdate, onStatus };
+    if (!listeners.has(ticker)) {
+        listeners.set(ticker, new Set());
+        send({ action: 'subscribe', tickers: [ticker] });
+    }
+    listeners.get(ticker).add(sub);
+
+    connect();
+    if (onStatus) onStatus(isOpen() ? 'connected' : 'connecting');
+
+    return () => {
+        const subs = listeners.get(ticker);
+        if (!subs) return;
+        subs.delete(sub);
+        if (subs.size === 0) {
+            listeners.delete(ticker);
+            aliases.forEach((requested) => requested.delete(ticker));
+            send({ action: 'unsubscribe', tickers: [ticker] });
+        }
+    };
+};